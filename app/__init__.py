@@ -138,6 +138,32 @@ def create_app():
         except Exception:
             db.session.rollback()
 
+        # --------------------------------------------------------------
+        # INDEX a) Date effective des sessions (années disponibles, filtres période)
+        # --------------------------------------------------------------
+        try:
+            exec_sql(
+                "CREATE INDEX IF NOT EXISTS ix_session_activite_date "
+                "ON session_activite ((coalesce(rdv_date, date_session)))"
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+        # --------------------------------------------------------------
+        # INDEX b) Recherche participant (préfixe sur lower(nom/prenom))
+        # --------------------------------------------------------------
+        if dialect == "postgresql":
+            try:
+                for col in ("nom", "prenom"):
+                    exec_sql(
+                        f"CREATE INDEX IF NOT EXISTS ix_participant_lower_{col} "
+                        f"ON participant (lower({col}) text_pattern_ops)"
+                    )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+
     # ------------------------------------------------------------------
     # INIT DB (ORDRE CRUCIAL)
     # ------------------------------------------------------------------
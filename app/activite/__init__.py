@@ -3,3 +3,4 @@ from flask import Blueprint
 bp = Blueprint("activite", __name__, url_prefix="/activite")
 
 from . import routes  # noqa: E402,F401
+from . import cli  # noqa: E402,F401
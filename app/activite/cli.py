@@ -0,0 +1,99 @@
+"""Commandes CLI du module activité (flask activite ...)."""
+
+from datetime import date
+
+import click
+from flask import current_app
+from sqlalchemy.orm import contains_eager
+
+from app.extensions import db
+from app.models import ArchiveEmargement, AtelierActivite, AtelierCapaciteMois, SessionActivite
+
+from . import bp
+from .services.docx_utils import enqueue_docx_to_pdf, generate_collectif_docx_async, generate_individuel_mensuel_docx
+
+
+def _archive(atelier, session_id: int | None, annee: int, mois: int) -> ArchiveEmargement:
+    arch = ArchiveEmargement.query.filter_by(atelier_id=atelier.id, session_id=session_id, annee=annee, mois=mois).first()
+    if not arch:
+        arch = ArchiveEmargement(secteur=atelier.secteur, atelier_id=atelier.id, session_id=session_id, annee=annee, mois=mois)
+        db.session.add(arch)
+    return arch
+
+
+@bp.cli.command("archives-mois")
+@click.argument("annee", type=int)
+@click.argument("mois", type=click.IntRange(1, 12))
+@click.option("--secteur", default=None, help="Limiter à un secteur (défaut : tous).")
+def archives_mois(annee: int, mois: int, secteur: str | None):
+    """Génère et fige les émargements d'un mois (DOCX + PDF) : sessions collectives et ateliers
+    individuels mensuels. À lancer le 1er du mois suivant par tâche planifiée.
+
+    Chaque DOCX part à la conversion PDF (enqueue_docx_to_pdf, pool LibreOffice) dès qu'il est
+    écrit : le DOCX suivant est rendu pendant que les précédents sont convertis, la durée totale
+    est bornée par l'étape la plus lente et non par la somme des deux.
+    """
+    app = current_app._get_current_object()
+    start = date(annee, mois, 1)
+    end = date(annee + (mois // 12), (mois % 12) + 1, 1)
+
+    sessions = (
+        SessionActivite.query.join(AtelierActivite, AtelierActivite.id == SessionActivite.atelier_id)
+        .options(contains_eager(SessionActivite.atelier))
+        .filter(
+            AtelierActivite.is_deleted.is_(False),
+            SessionActivite.is_deleted.is_(False),
+            SessionActivite.session_type == "COLLECTIF",
+            SessionActivite.date_session >= start,
+            SessionActivite.date_session < end,
+        )
+        .order_by(SessionActivite.date_session.asc(), SessionActivite.id.asc())
+    )
+    ateliers = (
+        AtelierActivite.query.join(SessionActivite, SessionActivite.atelier_id == AtelierActivite.id)
+        .filter(
+            AtelierActivite.is_deleted.is_(False),
+            AtelierActivite.type_atelier == "INDIVIDUEL_MENSUEL",
+            SessionActivite.is_deleted.is_(False),
+            SessionActivite.session_type == "INDIVIDUEL_MENSUEL",
+            SessionActivite.rdv_date >= start,
+            SessionActivite.rdv_date < end,
+        )
+        .distinct()
+        .order_by(AtelierActivite.id.asc())
+    )
+    if secteur:
+        sessions = sessions.filter(AtelierActivite.secteur == secteur)
+        ateliers = ateliers.filter(AtelierActivite.secteur == secteur)
+
+    # (atelier, session_id, docx, future pdf) : rendu DOCX ici, conversions en arrière-plan
+    jobs = []
+    for s in sessions.all():
+        out_docx, fut = generate_collectif_docx_async(app, s.atelier, s)
+        jobs.append((s.atelier, s.id, out_docx, fut))
+    for atelier in ateliers.all():
+        out_docx = generate_individuel_mensuel_docx(app, atelier, annee, mois)
+        jobs.append((atelier, None, out_docx, enqueue_docx_to_pdf(out_docx)))
+
+    n_pdf = 0
+    for atelier, session_id, out_docx, fut in jobs:
+        try:
+            out_pdf = fut.result()
+        except Exception:
+            app.logger.exception("Conversion PDF échouée : %s", out_docx)
+            out_pdf = None
+        arch = _archive(atelier, session_id, annee, mois)
+        arch.docx_path = out_docx
+        arch.pdf_path = out_pdf
+        if session_id is None:
+            # même effet que la route finalize_individuel
+            cap = AtelierCapaciteMois.query.filter_by(atelier_id=atelier.id, annee=annee, mois=mois).first()
+            if cap:
+                cap.locked = True
+            arch.status = "locked" if out_pdf else "open"
+        else:
+            arch.status = "locked"
+        n_pdf += bool(out_pdf)
+    db.session.commit()
+
+    click.echo(f"{len(jobs)} archive(s) générée(s) pour {mois:02d}/{annee}, dont {n_pdf} en PDF.")
@@ -24,7 +24,13 @@ from app.models import (
 )
 
 from . import bp
-from .services.docx_utils import generate_collectif_docx_pdf, generate_individuel_mensuel_docx, finalize_individuel_mensuel_pdf
+from .services.docx_utils import (
+    _try_docx_to_pdf,
+    enqueue_docx_to_pdf,
+    generate_collectif_docx_pdf,
+    generate_individuel_mensuel_docx,
+    finalize_individuel_mensuel_pdf,
+)
 from .services.mail_utils import send_email_with_attachment
 
 
@@ -1072,6 +1078,28 @@ def _best_archive_path(arch: ArchiveEmargement, kind: str) -> str | None:
     return arch.corrected_docx_path or arch.docx_path
 
 
+def _queue_archive_pdf(arch_id: int, docx_path: str) -> None:
+    """Convert the DOCX to PDF in the background, then record it on the archive."""
+    app = current_app._get_current_object()
+
+    def _done(fut):
+        try:
+            pdf_path = fut.result()
+        except Exception:
+            app.logger.exception("Conversion PDF en arrière-plan échouée : %s", docx_path)
+            return
+        if not pdf_path:
+            return
+        with app.app_context():
+            arch = db.session.get(ArchiveEmargement, arch_id)
+            # ignore si le DOCX a été régénéré entre-temps
+            if arch and arch.docx_path == docx_path:
+                arch.pdf_path = pdf_path
+                db.session.commit()
+
+    enqueue_docx_to_pdf(docx_path).add_done_callback(_done)
+
+
 @bp.route("/session/<int:session_id>/archive/<string:kind>")
 @login_required
 def download_collectif_archive(session_id: int, kind: str):
@@ -1090,15 +1118,26 @@ def download_collectif_archive(session_id: int, kind: str):
     mois = (s.date_session.month if s.date_session else datetime.utcnow().month)
     arch = ArchiveEmargement.query.filter_by(atelier_id=atelier.id, session_id=s.id, annee=annee, mois=mois).first()
     if not arch or not arch.docx_path:
-        out_docx, out_pdf = generate_collectif_docx_pdf(app=current_app, atelier=atelier, session=s)
+        # DOCX demandé : pas d'attente LibreOffice, le PDF est produit en arrière-plan
+        want_pdf = kind == "pdf"
+        out_docx, out_pdf = generate_collectif_docx_pdf(app=current_app, atelier=atelier, session=s, want_pdf=want_pdf)
         if not arch:
             arch = ArchiveEmargement(secteur=atelier.secteur, atelier_id=atelier.id, session_id=s.id, annee=annee, mois=mois)
             db.session.add(arch)
         arch.docx_path = out_docx
         arch.pdf_path = out_pdf
         db.session.commit()
+        if not want_pdf and out_docx:
+            _queue_archive_pdf(arch.id, out_docx)
 
     path = _best_archive_path(arch, kind)
+    if kind == "pdf" and not (path and os.path.exists(path)) and arch.docx_path and os.path.exists(arch.docx_path):
+        # PDF pas encore produit en arrière-plan (ou conversion échouée) : conversion immédiate
+        pdf_path = _try_docx_to_pdf(arch.docx_path)
+        if pdf_path:
+            arch.pdf_path = pdf_path
+            db.session.commit()
+            path = pdf_path
     if path and os.path.exists(path):
         return send_file(path, as_attachment=True)
     flash("Fichier introuvable (génère d'abord, ou LibreOffice manque pour le PDF).", "warning")
@@ -1,98 +1,372 @@
+import atexit
+import hashlib
+import io
 import os
+import queue
 import shutil
+import socket
 import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, date
+from functools import lru_cache
+from itertools import zip_longest
+from operator import attrgetter
 
 from docx import Document  # fallback
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
 
 from app.models import SessionActivite, PresenceActivite, Participant, AtelierCapaciteMois
 
 try:
-    from docxtpl import DocxTemplate, InlineImage
-    from docx.shared import Mm
+    from PIL import Image
 except Exception:  # pragma: no cover
-    DocxTemplate = None  # type: ignore
-    InlineImage = None  # type: ignore
-    Mm = None  # type: ignore
+    Image = None  # type: ignore
+
+try:
+    # python3-uno est fourni avec LibreOffice (pas toujours visible depuis le venv)
+    import uno
+    from com.sun.star.beans import PropertyValue
+except Exception:  # pragma: no cover
+    uno = None  # type: ignore
+    PropertyValue = None  # type: ignore
+
+
+# ASCII non alphanumérique (hors "-", "_", " ") -> supprimé
+_SAFE_TABLE = str.maketrans({c: None for c in map(chr, range(128)) if not (c.isalnum() or c in "-_ ")})
 
 
+@lru_cache(maxsize=1024)
 def _safe_filename(s: str) -> str:
-    return "".join(c for c in s if c.isalnum() or c in ("-", "_", " ")).strip().replace(" ", "_")
+    if s.isascii():
+        kept = s.translate(_SAFE_TABLE)
+    else:
+        # accents conservés, ponctuation unicode retirée
+        kept = "".join(c for c in s if c.isalnum() or c in ("-", "_", " "))
+    return kept.strip().replace(" ", "_")
 
 
-def _archives_root(app) -> str:
-    root = os.path.join(app.instance_path, "archives_emargements")
+@lru_cache(maxsize=None)
+def _archives_root_cached(instance_path: str) -> str:
+    root = os.path.join(instance_path, "archives_emargements")
     os.makedirs(root, exist_ok=True)
     return root
 
 
+def _archives_root(app) -> str:
+    # makedirs une seule fois par process (et par instance_path)
+    return _archives_root_cached(app.instance_path)
+
+
+@lru_cache(maxsize=None)
+def _sig_cache_dir_cached(instance_path: str) -> str:
+    folder = os.path.join(instance_path, "sig_cache")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _sig_cache_dir(app) -> str:
+    return _sig_cache_dir_cached(app.instance_path)
+
+
+_MONTH_FOLDERS = (
+    "01_Janvier",
+    "02_Fevrier",
+    "03_Mars",
+    "04_Avril",
+    "05_Mai",
+    "06_Juin",
+    "07_Juillet",
+    "08_Aout",
+    "09_Septembre",
+    "10_Octobre",
+    "11_Novembre",
+    "12_Decembre",
+)
+
+
 def _month_folder(month: int) -> str:
-    names = [
-        "01_Janvier",
-        "02_Fevrier",
-        "03_Mars",
-        "04_Avril",
-        "05_Mai",
-        "06_Juin",
-        "07_Juillet",
-        "08_Aout",
-        "09_Septembre",
-        "10_Octobre",
-        "11_Novembre",
-        "12_Decembre",
-    ]
     if 1 <= month <= 12:
-        return names[month - 1]
+        return _MONTH_FOLDERS[month - 1]
     return f"{month:02d}_Mois"
 
 
-def _try_docx_to_pdf(docx_path: str) -> str | None:
-    """Convert DOCX to PDF using LibreOffice (headless). Returns pdf path or None."""
-    if not os.path.exists(docx_path):
-        return None
-    out_dir = os.path.dirname(docx_path)
+def _archive_folder(root: str, secteur: str, year: int, atelier_nom: str, month: int) -> str:
+    """<root>/<secteur>/<année>/<atelier>/<MM_Mois> (parties déjà assainies, pas besoin d'os.path.join)."""
+    sep = os.sep
+    return f"{root}{sep}{_safe_filename(secteur)}{sep}{year}{sep}{_safe_filename(atelier_nom)}{sep}{_month_folder(month)}"
 
-    def _find_soffice() -> str | None:
-        """Locate LibreOffice CLI binary.
-
-        On Windows (especially when running as a service), LibreOffice is often
-        installed but not available on PATH. We therefore:
-        1) Check env LIBREOFFICE_PATH (user-configurable)
-        2) Try shutil.which for common commands
-        3) Probe common install locations on Windows
-        """
-        # 1) Explicit env override
-        env_path = os.environ.get("LIBREOFFICE_PATH")
-        if env_path and os.path.exists(env_path):
-            return env_path
-
-        # 2) PATH lookup
-        for cmd in ("soffice.com", "soffice", "libreoffice"):
-            p = shutil.which(cmd)
-            if p:
-                return p
-
-        # 3) Common Windows locations
-        if os.name == "nt":
-            candidates = [
-                r"C:\\Program Files\\LibreOffice\\program\\soffice.com",
-                r"C:\\Program Files\\LibreOffice\\program\\soffice.exe",
-                r"C:\\Program Files (x86)\\LibreOffice\\program\\soffice.com",
-                r"C:\\Program Files (x86)\\LibreOffice\\program\\soffice.exe",
-            ]
-            for c in candidates:
-                if os.path.exists(c):
-                    return c
-        return None
 
+@lru_cache(maxsize=1)
+def _find_soffice() -> str | None:
+    """Locate LibreOffice CLI binary (resolved once per process; restart after installing LibreOffice).
+
+    On Windows (especially when running as a service), LibreOffice is often
+    installed but not available on PATH. We therefore:
+    1) Check env LIBREOFFICE_PATH (user-configurable)
+    2) Try shutil.which for common commands
+    3) Probe common install locations on Windows
+    """
+    # 1) Explicit env override
+    env_path = os.environ.get("LIBREOFFICE_PATH")
+    if env_path and os.path.exists(env_path):
+        return env_path
+
+    # 2) PATH lookup
+    for cmd in ("soffice.com", "soffice", "libreoffice"):
+        p = shutil.which(cmd)
+        if p:
+            return p
+
+    # 3) Common Windows locations
+    if os.name == "nt":
+        candidates = [
+            r"C:\\Program Files\\LibreOffice\\program\\soffice.com",
+            r"C:\\Program Files\\LibreOffice\\program\\soffice.exe",
+            r"C:\\Program Files (x86)\\LibreOffice\\program\\soffice.com",
+            r"C:\\Program Files (x86)\\LibreOffice\\program\\soffice.exe",
+        ]
+        for c in candidates:
+            if os.path.exists(c):
+                return c
+    return None
+
+
+def _profile_uri(profile_dir: str) -> str:
+    os.makedirs(profile_dir, exist_ok=True)
+    return "file:///" + profile_dir.replace("\\", "/")
+
+
+def _free_port(host: str) -> int:
+    """Port TCP libre choisi par l'OS (chaque processus de l'app a ses propres listeners)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class _SofficeServer:
+    """Instance LibreOffice persistante pilotée via UNO.
+
+    Lancer `soffice --convert-to` coûte 2-3 s de démarrage à chaque document.
+    Ici on garde un seul process headless à l'écoute (--accept=socket) avec un
+    profil UserInstallation stable, lancé au premier besoin, et on lui envoie
+    les conversions par le pont UNO. Le process est recyclé après
+    `max_conversions` documents ou si le heartbeat échoue.
+
+    Profil propre au processus (pid + n° de slot) et port libre pris à chaque
+    lancement : plusieurs processus de l'app (workers gunicorn...) ne se
+    disputent ni un port UNO ni un profil.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        slot: int = 0,
+        max_conversions: int = 200,
+        start_timeout: float = 20.0,
+        retry_after: float = 300.0,
+    ):
+        self.host = host
+        self.port: int | None = None
+        self.max_conversions = max_conversions
+        self.start_timeout = start_timeout
+        # après un démarrage raté, pas de nouvel essai avant `retry_after` s (fallback one-shot direct)
+        self.retry_after = retry_after
+        self._failed_until = 0.0
+        self.profile_dir = os.path.join(tempfile.gettempdir(), f"erp_lo_profile_{os.getpid()}_{slot}")
+        self._lock = threading.Lock()
+        self._proc: subprocess.Popen | None = None
+        self._desktop = None
+        self._count = 0
+
+    @property
+    def available(self) -> bool:
+        return uno is not None and PropertyValue is not None
+
+    def _connect(self):
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+        ctx = resolver.resolve(f"uno:socket,host={self.host},port={self.port};urp;StarOffice.ComponentContext")
+        return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def _alive(self) -> bool:
+        if self._proc is None or self._proc.poll() is not None or self._desktop is None:
+            return False
+        try:
+            self._desktop.getComponents()  # heartbeat
+            return True
+        except Exception:
+            return False
+
+    def _start(self, soffice: str) -> None:
+        self.port = _free_port(self.host)
+        self._proc = subprocess.Popen(
+            [
+                soffice,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--nolockcheck",
+                "--norestore",
+                "--nodefault",
+                f"--env:UserInstallation={_profile_uri(self.profile_dir)}",
+                f"--accept=socket,host={self.host},port={self.port};urp;",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._count = 0
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                break
+            try:
+                self._desktop = self._connect()
+                return
+            except Exception:
+                time.sleep(0.25)
+        self.shutdown()
+        self._failed_until = time.monotonic() + self.retry_after
+        raise RuntimeError("LibreOffice listener did not start")
+
+    def shutdown(self) -> None:
+        desktop, proc = self._desktop, self._proc
+        self._desktop = None
+        self._proc = None
+        if desktop is not None:
+            try:
+                desktop.terminate()
+            except Exception:
+                pass
+        if proc is not None and proc.poll() is None:
+            try:
+                proc.wait(timeout=5)
+            except Exception:
+                proc.kill()
+
+    def convert_to_pdf(self, docx_path: str, out_dir: str) -> str | None:
+        """Convert via the UNO bridge. Raises on bridge failure (caller falls back)."""
+        soffice = _find_soffice()
+        if not self.available or not soffice:
+            raise RuntimeError("UNO bridge unavailable")
+
+        base = os.path.splitext(os.path.basename(docx_path))[0]
+        pdf_path = os.path.join(out_dir, f"{base}.pdf")
+
+        if time.monotonic() < self._failed_until:
+            raise RuntimeError("LibreOffice listener recently failed to start")
+
+        with self._lock:
+            # un autre thread a pu échouer au démarrage pendant qu'on attendait le verrou
+            if time.monotonic() < self._failed_until:
+                raise RuntimeError("LibreOffice listener recently failed to start")
+            if not self._alive():
+                self.shutdown()
+                self._start(soffice)
+            try:
+                in_url = uno.systemPathToFileUrl(os.path.abspath(docx_path))
+                out_url = uno.systemPathToFileUrl(os.path.abspath(pdf_path))
+                doc = self._desktop.loadComponentFromURL(
+                    in_url, "_blank", 0, (PropertyValue(Name="Hidden", Value=True),)
+                )
+                try:
+                    doc.storeToURL(out_url, (PropertyValue(Name="FilterName", Value="writer_pdf_Export"),))
+                finally:
+                    doc.close(True)
+            except Exception:
+                self.shutdown()
+                raise
+
+            self._count += 1
+            if self.max_conversions and self._count >= self.max_conversions:
+                self.shutdown()
+
+        return pdf_path if os.path.exists(pdf_path) else None
+
+
+class SofficePool:
+    """Pool de M listeners LibreOffice chauds pour paralléliser les conversions.
+
+    ⚠️ Chaque worker DOIT avoir son propre profil UserInstallation ET son propre
+    port : deux soffice qui partagent un profil se « passent la main » (le
+    second lancement délègue au premier puis quitte), ce qui resérialise tout.
+    Ici le worker i a le profil erp_lo_profile_<pid>_<i> et un port libre
+    choisi par l'OS à chaque lancement.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_conversions: int = 200,
+        start_timeout: float = 20.0,
+        retry_after: float = 300.0,
+    ):
+        self.size = max(1, size)
+        self.workers = [
+            _SofficeServer(
+                slot=i,
+                max_conversions=max_conversions,
+                start_timeout=start_timeout,
+                retry_after=retry_after,
+            )
+            for i in range(self.size)
+        ]
+        self._idle: queue.Queue[_SofficeServer] = queue.Queue()
+        for w in self.workers:
+            self._idle.put(w)
+
+    @property
+    def available(self) -> bool:
+        return self.workers[0].available
+
+    def convert(self, docx_path: str, out_dir: str | None = None) -> str | None:
+        """Check out an idle worker, convert, give the worker back."""
+        worker = self._idle.get()
+        try:
+            return worker.convert_to_pdf(docx_path, out_dir or os.path.dirname(docx_path))
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        for w in self.workers:
+            w.shutdown()
+            # profil propre à ce processus : inutile de le laisser dans le dossier temporaire
+            shutil.rmtree(w.profile_dir, ignore_errors=True)
+
+
+@lru_cache(maxsize=1)
+def _soffice_pool() -> SofficePool:
+    """Pool créé à la première conversion : un processus qui n'en fait pas (fils "spawn"
+    de l'export xlsx, ...) ne crée ni pool ni profil."""
+    pool = SofficePool(
+        size=int(os.environ.get("LIBREOFFICE_POOL_SIZE", "2")),
+        max_conversions=int(os.environ.get("LIBREOFFICE_MAX_CONVERSIONS", "200")),
+        # attente max (s) du listener au démarrage, puis délai avant de retenter après un échec
+        start_timeout=float(os.environ.get("LIBREOFFICE_START_TIMEOUT", "20")),
+        retry_after=float(os.environ.get("LIBREOFFICE_RETRY_AFTER", "300")),
+    )
+    atexit.register(pool.shutdown)
+    return pool
+
+
+# Durée max (s) d'une conversion one-shot avant abandon
+_SUBPROCESS_TIMEOUT = int(os.environ.get("LIBREOFFICE_TIMEOUT", "60"))
+
+
+def _try_docx_to_pdf_subprocess(docx_path: str, out_dir: str) -> str | None:
+    """Fallback: one-shot `soffice --convert-to pdf` (slow: full LibreOffice startup)."""
     soffice = _find_soffice()
     if not soffice:
         return None
 
     # Dedicated headless profile (avoids AppData/locking issues under services)
-    profile_dir = os.path.join(out_dir, "_lo_profile")
-    os.makedirs(profile_dir, exist_ok=True)
-    profile_uri = "file:///" + profile_dir.replace("\\", "/")
+    profile_uri = _profile_uri(os.path.join(out_dir, "_lo_profile"))
     try:
         subprocess.run(
             [
@@ -109,24 +383,57 @@ def _try_docx_to_pdf(docx_path: str) -> str | None:
                 docx_path,
             ],
             check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            # sortie de soffice jamais lue : pas de tampon mémoire
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=_SUBPROCESS_TIMEOUT,
         )
         base = os.path.splitext(os.path.basename(docx_path))[0]
         pdf_path = os.path.join(out_dir, f"{base}.pdf")
         return pdf_path if os.path.exists(pdf_path) else None
+    except subprocess.TimeoutExpired:
+        # soffice bloqué : subprocess.run() a déjà tué le processus
+        return None
     except Exception:
         return None
 
 
-def _install_default_templates(app) -> dict[str, str]:
-    """Ensure Antoine's provided templates exist in instance/ and return their paths."""
-    tpl_dir = os.path.join(app.instance_path, "docx_templates")
-    os.makedirs(tpl_dir, exist_ok=True)
+def _try_docx_to_pdf(docx_path: str) -> str | None:
+    """Convert DOCX to PDF using LibreOffice (headless). Returns pdf path or None.
 
-    # packaged assets (tracked in repo)
-    assets_dir = os.path.join(os.path.dirname(__file__), "..", "assets")
-    assets_dir = os.path.abspath(assets_dir)
+    Prefers the persistent listener (UNO); falls back to a one-shot soffice
+    process if the bridge is not available or fails.
+    """
+    if not os.path.exists(docx_path):
+        return None
+    out_dir = os.path.dirname(docx_path)
+
+    pool = _soffice_pool()
+    if pool.available:
+        try:
+            pdf_path = pool.convert(docx_path, out_dir)
+            if pdf_path:
+                return pdf_path
+        except Exception:
+            pass
+    return _try_docx_to_pdf_subprocess(docx_path, out_dir)
+
+
+@lru_cache(maxsize=1)
+def _pdf_executor() -> ThreadPoolExecutor:
+    """Conversions PDF en arrière-plan : un thread par worker soffice du pool."""
+    return ThreadPoolExecutor(max_workers=_soffice_pool().size, thread_name_prefix="docx2pdf")
+
+
+def enqueue_docx_to_pdf(docx_path: str) -> Future:
+    """Queue a PDF conversion on the shared executor; the future yields the pdf path or None."""
+    return _pdf_executor().submit(_try_docx_to_pdf, docx_path)
+
+
+@lru_cache(maxsize=None)
+def _install_default_templates_cached(instance_path: str, assets_dir: str) -> dict[str, str]:
+    tpl_dir = os.path.join(instance_path, "docx_templates")
+    os.makedirs(tpl_dir, exist_ok=True)
 
     mapping = {
         "collectif": os.path.join(tpl_dir, "modele_collectif.docx"),
@@ -144,36 +451,205 @@ def _install_default_templates(app) -> dict[str, str]:
     return mapping
 
 
+def _install_default_templates(app) -> dict[str, str]:
+    """Ensure Antoine's provided templates exist in instance/ and return their paths.
+
+    The filesystem checks run once per process (cached on instance_path).
+    """
+    # packaged assets (tracked in repo)
+    assets_dir = os.path.join(os.path.dirname(__file__), "..", "assets")
+    assets_dir = os.path.abspath(assets_dir)
+    return dict(_install_default_templates_cached(app.instance_path, assets_dir))
+
+
+@lru_cache(maxsize=16)
+def _load_template_bytes(path: str, mtime: float) -> bytes:
+    """Raw .docx bytes, cached per (path, mtime): a modified template is re-read."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=1)
+def _blank_docx_bytes() -> bytes:
+    """python-docx default document, serialized once (Document() re-parses the bundled template each time)."""
+    buf = io.BytesIO()
+    Document().save(buf)
+    return buf.getvalue()
+
+
+def _fallback_document(template_path: str | None):
+    """Fresh, mutable Document for the python-docx fallback, built from cached bytes."""
+    if template_path and os.path.exists(template_path):
+        data = _load_template_bytes(template_path, os.stat(template_path).st_mtime)
+    else:
+        data = _blank_docx_bytes()
+    return Document(io.BytesIO(data))
+
+
+@lru_cache(maxsize=1)
+def _docxtpl():
+    """docxtpl + Jinja2, imported on first DOCX render rather than at app start.
+
+    Returns (DocxTemplate, InlineImage, Mm, jinja_env) or None if unavailable.
+    The Jinja Environment is shared by every render.
+    """
+    try:
+        from docxtpl import DocxTemplate, InlineImage
+        from docx.shared import Mm
+        from jinja2 import Environment
+    except Exception:  # pragma: no cover
+        return None
+    return DocxTemplate, InlineImage, Mm, Environment()
+
+
+def _docxtpl_ok() -> bool:
+    return _docxtpl() is not None
+
+
+def _open_template(path: str):
+    """DocxTemplate built from the cached bytes instead of re-reading the file."""
+    DocxTemplate = _docxtpl()[0]
+    return DocxTemplate(io.BytesIO(_load_template_bytes(path, os.stat(path).st_mtime)))
+
+
+def _render(tpl, context: dict) -> None:
+    tpl.render(context, jinja_env=_docxtpl()[3])
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    """Write a generated file in a single call, atomically (temp file + os.replace).
+
+    Download routes never see a half-written document, even with concurrent
+    generations of the same archive.
+    """
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _save_docx(doc, path: str) -> None:
+    """Serialize a Document/DocxTemplate in memory, then hand the bytes to _write_bytes."""
+    buf = io.BytesIO()
+    doc.save(buf)
+    _write_bytes(path, buf.getvalue())
+
+
+def _clear_body_rows(table) -> None:
+    """Drop every row but the header, in one pass over the <w:tbl> element."""
+    tbl = table._tbl
+    for tr in tbl.findall(qn("w:tr"))[1:]:
+        tbl.remove(tr)
+
+
+def _append_text_rows(table, rows: Iterable[list[str]]) -> None:
+    """Append plain-text rows straight into the table XML.
+
+    Same markup as table.add_row() + cell.text, without walking the
+    python-docx object model for every cell. A row gets one cell per grid
+    column and per value, whichever is more: a template table with fewer
+    columns than values still shows every value.
+    """
+    tbl = table._tbl
+    widths = [gc.w for gc in tbl.tblGrid.gridCol_lst]
+    for values in rows:
+        tr = OxmlElement("w:tr")
+        for w, value in zip_longest(widths, values):
+            tc = OxmlElement("w:tc")
+            if w is not None:
+                tc.width = w
+            p = OxmlElement("w:p")
+            if value:
+                # CT_R.text : \t -> <w:tab/>, \n -> <w:br/>, xml:space="preserve" si besoin (comme cell.text)
+                r = OxmlElement("w:r")
+                r.text = value
+                p.append(r)
+            tc.append(p)
+            tr.append(tc)
+        tbl.append(tr)
+
+
+# Colonnes participant lues pour chaque ligne d'émargement (un seul appel C par participant)
+_participant_fields = attrgetter("nom", "prenom", "email", "date_naissance", "genre", "ville", "type_public")
+
+# Taille des lots ORM lors de la lecture des présences (mémoire bornée sur les gros mois)
+_PRESENCE_BATCH = 200
+
+
 def _format_date_fr(d: date | None) -> str:
     return d.strftime("%d/%m/%Y") if d else ""
 
 
-def _inline_signature(app, signature_path: str | None):
-    """Return an InlineImage for docxtpl, or empty string if missing."""
-    if not signature_path or not os.path.exists(signature_path):
-        return ""
-    if DocxTemplate is None or InlineImage is None or Mm is None:
-        return ""
+_SIGNATURE_MAX_PX = 300
+
+
+def _prepared_signature(cache_dir: str | None, path: str) -> str:
+    """Return a reduced copy (<= 300px) of a signature image, cached in instance/sig_cache.
+
+    The cached file is rebuilt when the source is newer. Small images, and any
+    error, fall back to the original path.
+    """
+    if Image is None or not cache_dir:
+        return path
+    cached = os.path.join(cache_dir, hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest() + ".png")
     try:
-        # 30mm wide is readable in a cell
-        return InlineImage(DocxTemplate(""), signature_path, width=Mm(30))  # dummy template replaced in render
+        if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(path):
+            return cached
+        with Image.open(path) as im:
+            if im.width <= _SIGNATURE_MAX_PX and im.height <= _SIGNATURE_MAX_PX:
+                return path
+            im.thumbnail((_SIGNATURE_MAX_PX, _SIGNATURE_MAX_PX))
+            buf = io.BytesIO()
+            im.save(buf, "PNG")
+        _write_bytes(cached, buf.getvalue())
+        return cached
     except Exception:
-        return ""
+        return path
 
 
-def _docxtpl_inline(template, signature_path: str | None):
+def _docxtpl_inline(template, signature_path: str | None, cache_dir: str | None = None):
     if not signature_path or not os.path.exists(signature_path):
         return ""
-    if InlineImage is None or Mm is None:
+    api = _docxtpl()
+    if api is None:
         return ""
+    _, InlineImage, Mm, _ = api
     try:
-        return InlineImage(template, signature_path, width=Mm(30))
+        return InlineImage(template, _prepared_signature(cache_dir, signature_path), width=Mm(30))
     except Exception:
         return ""
 
 
-def generate_collectif_docx_pdf(app, atelier, session: SessionActivite):
-    """Generate a DOCX (and try PDF) for a collective session.
+def _participant_rows(presences, tpl=None, sig_cache: str | None = None) -> Iterator[dict]:
+    """Yield one emargement row per presence.
+
+    With a docxtpl template the row carries the signature image; without one
+    (python-docx fallback table) it carries the motif column instead.
+    """
+    for pr in presences:
+        nom, prenom, email, ddn, genre, ville, type_public = _participant_fields(pr.participant)
+        row = {
+            "nom": f"{(nom or '').upper()} {(prenom or '')}",
+            "email": email or "",
+            "ddn": _format_date_fr(ddn),
+            "sexe": genre or "",
+            "type": type_public or "H",
+            "ville": ville or "",
+        }
+        if tpl is not None:
+            row["signature"] = _docxtpl_inline(tpl, pr.signature_path, sig_cache)
+        else:
+            row["motif"] = pr.motif or ""
+        yield row
+
+
+def generate_collectif_docx(app, atelier, session: SessionActivite) -> str:
+    """Generate the DOCX for a collective session.
 
     Uses docxtpl when a template is provided (Jinja in DOCX).
     Falls back to python-docx for simple templates.
@@ -182,7 +658,7 @@ def generate_collectif_docx_pdf(app, atelier, session: SessionActivite):
     y, m = dt.year, dt.month
 
     root = _archives_root(app)
-    folder = os.path.join(root, _safe_filename(atelier.secteur), str(y), _safe_filename(atelier.nom), _month_folder(m))
+    folder = _archive_folder(root, atelier.secteur, y, atelier.nom, m)
     os.makedirs(folder, exist_ok=True)
 
     time_label = (session.heure_debut or "")
@@ -190,47 +666,36 @@ def generate_collectif_docx_pdf(app, atelier, session: SessionActivite):
         time_label = f"{time_label}-{session.heure_fin}" if time_label else session.heure_fin
 
     fname = f"{dt.isoformat()}__COLLECTIF__{_safe_filename(atelier.nom)}__{_safe_filename(time_label or 'session')}.docx"
-    out_docx = os.path.join(folder, fname)
+    out_docx = f"{folder}{os.sep}{fname}"
 
     defaults = _install_default_templates(app)
     template_path = atelier.modele_docx_collectif or defaults.get("collectif")
 
+    # participant chargé dans la même requête (sinon 1 SELECT par ligne)
     presences = (
         PresenceActivite.query.filter_by(session_id=session.id)
         .join(Participant)
+        .options(contains_eager(PresenceActivite.participant))
         .order_by(Participant.nom.asc(), Participant.prenom.asc())
-        .all()
+        .yield_per(_PRESENCE_BATCH)
     )
 
-    if DocxTemplate is not None and template_path and os.path.exists(template_path):
-        tpl = DocxTemplate(template_path)
-        participants = []
-        for pr in presences:
-            p = pr.participant
-            participants.append(
-                {
-                    "nom": f"{(p.nom or '').upper()} {(p.prenom or '')}",
-                    "email": p.email or "",
-                    "ddn": _format_date_fr(p.date_naissance),
-                    "sexe": p.genre or "",
-                    "type": getattr(p, "type_public", None) or "H",
-                    "ville": p.ville or "",
-                    "signature": _docxtpl_inline(tpl, pr.signature_path),
-                }
-            )
+    if _docxtpl_ok() and template_path and os.path.exists(template_path):
+        tpl = _open_template(template_path)
         context = {
             "lieu": getattr(session, "lieu", None) or "",
             "date": dt.strftime("%d/%m/%Y"),
             "horaires": time_label,
             "titre": atelier.nom,
             "intervenant": "",
-            "participants": participants,
+            # docxtpl itère plusieurs fois sur le contexte : liste obligatoire
+            "participants": list(_participant_rows(presences, tpl, _sig_cache_dir(app))),
         }
-        tpl.render(context)
-        tpl.save(out_docx)
+        _render(tpl, context)
+        _save_docx(tpl, out_docx)
     else:
         # Fallback: basic table using python-docx
-        doc = Document(template_path) if template_path and os.path.exists(template_path) else Document()
+        doc = _fallback_document(template_path)
         if not doc.paragraphs:
             doc.add_heading(f"Feuille d'émargement - {atelier.nom}", level=1)
         table = doc.tables[0] if doc.tables else doc.add_table(rows=1, cols=8)
@@ -238,62 +703,83 @@ def generate_collectif_docx_pdf(app, atelier, session: SessionActivite):
             headers = ["Nom", "Email", "DDN", "Sexe", "Type", "Ville", "Motif", "Signature"]
             for i, h in enumerate(headers):
                 table.cell(0, i).text = h
-        while len(table.rows) > 1:
-            tbl = table._tbl
-            tbl.remove(table.rows[1]._tr)
-        for pr in presences:
-            p = pr.participant
-            row = table.add_row().cells
-            row[0].text = f"{(p.nom or '').upper()} {(p.prenom or '')}"
-            row[1].text = p.email or ""
-            row[2].text = _format_date_fr(p.date_naissance)
-            row[3].text = p.genre or ""
-            row[4].text = getattr(p, "type_public", None) or "H"
-            row[5].text = p.ville or ""
-            row[6].text = pr.motif or ""
-            row[7].text = ""
-        doc.save(out_docx)
-
-    out_pdf = _try_docx_to_pdf(out_docx)
+        _clear_body_rows(table)
+        _append_text_rows(
+            table,
+            (
+                [r["nom"], r["email"], r["ddn"], r["sexe"], r["type"], r["ville"], r["motif"], ""]
+                for r in _participant_rows(presences)
+            ),
+        )
+        _save_docx(doc, out_docx)
+
+    return out_docx
+
+
+def generate_collectif_docx_pdf(app, atelier, session: SessionActivite, want_pdf: bool = True):
+    """Generate a DOCX (and try PDF) for a collective session.
+
+    want_pdf=False skips the LibreOffice step (returns (docx, None)); the
+    caller can hand the DOCX to enqueue_docx_to_pdf() if it wants the PDF later.
+    """
+    out_docx = generate_collectif_docx(app, atelier, session)
+    out_pdf = _try_docx_to_pdf(out_docx) if want_pdf else None
     return out_docx, out_pdf
 
 
+def generate_collectif_docx_async(app, atelier, session: SessionActivite) -> tuple[str, Future]:
+    """Generate the DOCX now and convert it to PDF in the background.
+
+    Returns (docx_path, future_pdf_path). In a loop over sessions (flask activite
+    archives-mois), the DOCX of session N+1 is rendered while session N is being
+    converted, so throughput is bounded by the slowest stage instead of the sum of both.
+    """
+    out_docx = generate_collectif_docx(app, atelier, session)
+    return out_docx, enqueue_docx_to_pdf(out_docx)
+
+
 def generate_individuel_mensuel_docx(app, atelier, annee: int, mois: int) -> str:
     """Generate a DOCX for an INDIVIDUEL_MENSUEL atelier for a month."""
     root = _archives_root(app)
-    folder = os.path.join(root, _safe_filename(atelier.secteur), str(annee), _safe_filename(atelier.nom), _month_folder(mois))
+    folder = _archive_folder(root, atelier.secteur, annee, atelier.nom, mois)
     os.makedirs(folder, exist_ok=True)
 
     fname = f"{annee}-{mois:02d}__INDIVIDUEL__{_safe_filename(atelier.nom)}.docx"
-    out_docx = os.path.join(folder, fname)
+    out_docx = f"{folder}{os.sep}{fname}"
 
     defaults = _install_default_templates(app)
     template_path = atelier.modele_docx_individuel or defaults.get("individuel")
 
-    # Fetch RDV sessions
+    # Fetch RDV sessions of the month (bornes + tri côté SQL)
+    start = date(annee, mois, 1)
+    end = date(annee + (mois // 12), (mois % 12) + 1, 1)
     sessions = (
         SessionActivite.query.filter_by(atelier_id=atelier.id, session_type="INDIVIDUEL_MENSUEL", is_deleted=False)
-        .filter(SessionActivite.rdv_date.isnot(None))
-        .filter(SessionActivite.rdv_date >= date(annee, mois, 1))
+        .filter(SessionActivite.rdv_date >= start, SessionActivite.rdv_date < end)
+        .order_by(SessionActivite.rdv_date.asc(), func.coalesce(SessionActivite.rdv_debut, "").asc())
         .all()
     )
 
-    # Only keep month
-    sessions = [s for s in sessions if s.rdv_date and s.rdv_date.year == annee and s.rdv_date.month == mois]
-    sessions.sort(key=lambda s: (s.rdv_date or date(annee, mois, 1), s.rdv_debut or ""))
+    # 1st presence (by nom/prenom) of every session, fetched in a single query
+    first_presence: dict[int, PresenceActivite] = {}
+    if sessions:
+        all_presences = (
+            PresenceActivite.query.filter(PresenceActivite.session_id.in_([s.id for s in sessions]))
+            .join(Participant)
+            .options(contains_eager(PresenceActivite.participant))
+            .order_by(PresenceActivite.session_id.asc(), Participant.nom.asc(), Participant.prenom.asc())
+            .yield_per(_PRESENCE_BATCH)
+        )
+        for pr in all_presences:
+            first_presence.setdefault(pr.session_id, pr)
 
     # Build rows (one line per RDV). We take the 1st presence as the participant for individual.
     rows = []
     for s in sessions:
-        pr = (
-            PresenceActivite.query.filter_by(session_id=s.id)
-            .join(Participant)
-            .order_by(Participant.nom.asc(), Participant.prenom.asc())
-            .first()
-        )
+        pr = first_presence.get(s.id)
         if not pr:
             continue
-        p = pr.participant
+        nom, prenom, email, ddn, genre, ville, type_public = _participant_fields(pr.participant)
         heures = ""
         if s.rdv_debut and s.rdv_fin:
             heures = f"{s.rdv_debut} - {s.rdv_fin}"
@@ -305,24 +791,25 @@ def generate_individuel_mensuel_docx(app, atelier, annee: int, mois: int) -> str
 
         rows.append(
             {
-                "nom": f"{(p.nom or '').upper()} {(p.prenom or '')}",
-                "email": p.email or "",
-                "ddn": _format_date_fr(p.date_naissance),
-                "sexe": p.genre or "",
-                "type": getattr(p, "type_public", None) or "H",
+                "nom": f"{(nom or '').upper()} {(prenom or '')}",
+                "email": email or "",
+                "ddn": _format_date_fr(ddn),
+                "sexe": genre or "",
+                "type": type_public or "H",
                 "da": _format_date_fr(s.rdv_date),  # IMPORTANT: your template currently uses p.da
                 "heures": heures,
                 "motif": motif,
-                "ville": p.ville or "",
+                "ville": ville or "",
                 "signature": None,  # filled below if docxtpl
                 "_sig_path": pr.signature_path,
             }
         )
 
-    if DocxTemplate is not None and template_path and os.path.exists(template_path):
-        tpl = DocxTemplate(template_path)
+    if _docxtpl_ok() and template_path and os.path.exists(template_path):
+        tpl = _open_template(template_path)
+        sig_cache = _sig_cache_dir(app)
         for r in rows:
-            r["signature"] = _docxtpl_inline(tpl, r.pop("_sig_path", None))
+            r["signature"] = _docxtpl_inline(tpl, r.pop("_sig_path", None), sig_cache)
         context = {
             "lieu": getattr(atelier, "lieu", None) or "",
             "mois": mois,
@@ -331,32 +818,36 @@ def generate_individuel_mensuel_docx(app, atelier, annee: int, mois: int) -> str
             "intervenant": "",
             "participants": rows,
         }
-        tpl.render(context)
-        tpl.save(out_docx)
+        _render(tpl, context)
+        _save_docx(tpl, out_docx)
     else:
         # fallback
-        doc = Document(template_path) if template_path and os.path.exists(template_path) else Document()
+        doc = _fallback_document(template_path)
         doc.add_paragraph(f"{atelier.nom} - {mois:02d}/{annee}")
         table = doc.tables[0] if doc.tables else doc.add_table(rows=1, cols=9)
         if len(table.rows) == 1:
             headers = ["Nom", "Email", "DDN", "Sexe", "Type", "Date", "Heures", "Motif", "Ville"]
             for i, h in enumerate(headers):
                 table.cell(0, i).text = h
-        while len(table.rows) > 1:
-            tbl = table._tbl
-            tbl.remove(table.rows[1]._tr)
-        for r in rows:
-            row = table.add_row().cells
-            row[0].text = r.get("nom", "")
-            row[1].text = r.get("email", "")
-            row[2].text = r.get("ddn", "")
-            row[3].text = r.get("sexe", "")
-            row[4].text = r.get("type", "H")
-            row[5].text = r.get("da", "")
-            row[6].text = r.get("heures", "")
-            row[7].text = r.get("motif", "")
-            row[8].text = r.get("ville", "")
-        doc.save(out_docx)
+        _clear_body_rows(table)
+        _append_text_rows(
+            table,
+            [
+                [
+                    r.get("nom", ""),
+                    r.get("email", ""),
+                    r.get("ddn", ""),
+                    r.get("sexe", ""),
+                    r.get("type", "H"),
+                    r.get("da", ""),
+                    r.get("heures", ""),
+                    r.get("motif", ""),
+                    r.get("ville", ""),
+                ]
+                for r in rows
+            ],
+        )
+        _save_docx(doc, out_docx)
 
     return out_docx
 
@@ -370,12 +861,12 @@ def generate_participant_bilan_docx(app, participant, rows: list[dict]) -> str:
     folder = os.path.join(app.instance_path, "archives_pedagogie")
     os.makedirs(folder, exist_ok=True)
     fname = f"bilan_{participant.id}_{_safe_filename(participant.nom)}_{_safe_filename(participant.prenom)}.docx"
-    out_docx = os.path.join(folder, fname)
+    out_docx = f"{folder}{os.sep}{fname}"
 
     template_path = os.path.join(app.instance_path, "docx_templates", "bilan_pedagogique.docx")
 
-    if DocxTemplate and os.path.exists(template_path):
-        tpl = DocxTemplate(template_path)
+    if _docxtpl_ok() and os.path.exists(template_path):
+        tpl = _open_template(template_path)
         context = {
             "participant": {
                 "nom": participant.nom,
@@ -386,10 +877,10 @@ def generate_participant_bilan_docx(app, participant, rows: list[dict]) -> str:
             "rows": rows,
             "date": date.today().strftime("%d/%m/%Y"),
         }
-        tpl.render(context)
-        tpl.save(out_docx)
+        _render(tpl, context)
+        _save_docx(tpl, out_docx)
     else:
-        doc = Document(template_path) if template_path and os.path.exists(template_path) else Document()
+        doc = _fallback_document(template_path)
         doc.add_heading("Bilan pédagogique", level=1)
         doc.add_paragraph(f"Participant : {participant.nom} {participant.prenom}")
         if participant.email:
@@ -401,13 +892,11 @@ def generate_participant_bilan_docx(app, participant, rows: list[dict]) -> str:
         headers = ["Référentiel", "Compétence", "Date", "Atelier"]
         for i, h in enumerate(headers):
             table.cell(0, i).text = h
-        for r in rows:
-            row = table.add_row().cells
-            row[0].text = r.get("referentiel", "")
-            row[1].text = r.get("competence", "")
-            row[2].text = r.get("date", "")
-            row[3].text = r.get("atelier", "")
-        doc.save(out_docx)
+        _append_text_rows(
+            table,
+            [[r.get("referentiel", ""), r.get("competence", ""), r.get("date", ""), r.get("atelier", "")] for r in rows],
+        )
+        _save_docx(doc, out_docx)
 
     return out_docx
 
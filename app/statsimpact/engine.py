@@ -265,6 +265,20 @@ def _resolve_secteur_scope(flt: StatsFilters) -> Optional[str]:
     return "__restricted__"
 
 
+# "%" / "_" saisis dans la recherche = caractères littéraux, pas des jokers LIKE
+_LIKE_ESCAPE = str.maketrans({"\\": "\\\\", "%": "\\%", "_": "\\_"})
+
+
+def _participant_name_filter(q: str):
+    """Recherche participant : nom ou prénom commençant par `q` (insensible à la casse).
+
+    Préfixe plutôt que sous-chaîne : lower(nom) LIKE 'q%' peut utiliser l'index
+    fonctionnel ix_participant_lower_nom / _prenom (Postgres, text_pattern_ops).
+    """
+    prefix = f"{q.lower().translate(_LIKE_ESCAPE)}%"
+    return func.lower(Participant.nom).like(prefix, escape="\\") | func.lower(Participant.prenom).like(prefix, escape="\\")
+
+
 def _apply_common_filters(query, flt: StatsFilters):
     query = query.filter(SessionActivite.is_deleted.is_(False))
     query = query.filter(AtelierActivite.is_deleted.is_(False))
@@ -1012,11 +1026,7 @@ def compute_magatomatique(
     if participant_q:
         pq = participant_q.strip()
         if pq:
-            like = f"%{pq.lower()}%"
-            part_q = part_q.filter(
-                func.lower(func.coalesce(Participant.nom, "")).like(like)
-                | func.lower(func.coalesce(Participant.prenom, "")).like(like)
-            )
+            part_q = part_q.filter(_participant_name_filter(pq))
 
     part_q = part_q.distinct().order_by(Participant.nom.asc(), Participant.prenom.asc())
     if max_participants and max_participants > 0:
@@ -1,19 +1,27 @@
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from copy import deepcopy
+from dataclasses import astuple
 from datetime import date
-from io import BytesIO, StringIO
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from tempfile import SpooledTemporaryFile
 import csv
 
+import multiprocessing
 import os
+import threading
+import time
 
-from flask import Blueprint, abort, render_template, request, redirect, url_for, flash, current_app, send_file, Response
+from flask import Blueprint, abort, render_template, request, redirect, url_for, flash, current_app, send_file, Response, g, stream_with_context
 from flask_login import login_required, current_user
+from werkzeug.exceptions import HTTPException
 from app.rbac import can
 
-from sqlalchemy import func
-
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
+from sqlalchemy import case, delete, func, literal, update
+from sqlalchemy.orm import selectinload
 
 from app.extensions import db
 
@@ -33,6 +41,15 @@ from app.models import (
 from app.activite.services.docx_utils import generate_participant_bilan_pdf
 
 from .occupancy import compute_occupancy_stats
+from .xlsx_export import (
+    RawSheet,
+    RawWorkbook,
+    atelier_sheet_rows,
+    matrix_sheet_xml,
+    render_atelier_sheet,
+    unique_sheet_title,
+    width_runs,
+)
 
 from .engine import (
     compute_volume_activity_stats,
@@ -43,6 +60,7 @@ from .engine import (
     compute_magatomatique,
     normalize_filters,
     _apply_common_filters,
+    _participant_name_filter,
     _session_date_expr,
 )
 
@@ -97,6 +115,17 @@ CSV_FIELD_GROUPS = [
     },
 ]
 
+# Lignes lues par lot (curseur serveur) lors de l'export CSV
+_CSV_BATCH = 2000
+
+
+class _CsvLine:
+    """Pseudo-fichier pour csv.writer : writerow() renvoie directement la ligne formatée."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
 CSV_DEFAULT_FIELDS = [
     "participant_nom",
     "participant_prenom",
@@ -115,58 +144,140 @@ def _fmt_datetime(value) -> str:
     return value.strftime("%Y-%m-%d %H:%M") if value else ""
 
 
+# getter(pr, p, s, a, q) = (presence, participant, session, atelier, quartier) : une ligne de _query_presence_export()
 CSV_FIELD_MAP = {
-    "participant_id": {"label": "ID participant", "getter": lambda ctx: ctx["participant"].id},
-    "participant_nom": {"label": "Nom", "getter": lambda ctx: ctx["participant"].nom or ""},
-    "participant_prenom": {"label": "Prénom", "getter": lambda ctx: ctx["participant"].prenom or ""},
-    "participant_email": {"label": "Email", "getter": lambda ctx: ctx["participant"].email or ""},
-    "participant_telephone": {"label": "Téléphone", "getter": lambda ctx: ctx["participant"].telephone or ""},
-    "participant_ville": {"label": "Ville", "getter": lambda ctx: ctx["participant"].ville or ""},
+    "participant_id": {"label": "ID participant", "getter": lambda pr, p, s, a, q: p.id},
+    "participant_nom": {"label": "Nom", "getter": lambda pr, p, s, a, q: p.nom or ""},
+    "participant_prenom": {"label": "Prénom", "getter": lambda pr, p, s, a, q: p.prenom or ""},
+    "participant_email": {"label": "Email", "getter": lambda pr, p, s, a, q: p.email or ""},
+    "participant_telephone": {"label": "Téléphone", "getter": lambda pr, p, s, a, q: p.telephone or ""},
+    "participant_ville": {"label": "Ville", "getter": lambda pr, p, s, a, q: p.ville or ""},
     "participant_quartier": {
         "label": "Quartier",
-        "getter": lambda ctx: ctx["quartier"].nom if ctx["quartier"] else "",
+        "getter": lambda pr, p, s, a, q: q.nom if q else "",
     },
-    "participant_genre": {"label": "Genre", "getter": lambda ctx: ctx["participant"].genre or ""},
-    "participant_type_public": {"label": "Type public", "getter": lambda ctx: ctx["participant"].type_public or ""},
+    "participant_genre": {"label": "Genre", "getter": lambda pr, p, s, a, q: p.genre or ""},
+    "participant_type_public": {"label": "Type public", "getter": lambda pr, p, s, a, q: p.type_public or ""},
     "participant_date_naissance": {
         "label": "Date naissance",
-        "getter": lambda ctx: _fmt_date(ctx["participant"].date_naissance),
+        "getter": lambda pr, p, s, a, q: _fmt_date(p.date_naissance),
     },
-    "session_id": {"label": "ID session", "getter": lambda ctx: ctx["session"].id},
+    "session_id": {"label": "ID session", "getter": lambda pr, p, s, a, q: s.id},
     "session_date": {
         "label": "Date session",
-        "getter": lambda ctx: _fmt_date(ctx["session"].rdv_date or ctx["session"].date_session),
+        "getter": lambda pr, p, s, a, q: _fmt_date(s.rdv_date or s.date_session),
     },
-    "session_type": {"label": "Type session", "getter": lambda ctx: ctx["session"].session_type or ""},
-    "session_statut": {"label": "Statut session", "getter": lambda ctx: ctx["session"].statut or ""},
+    "session_type": {"label": "Type session", "getter": lambda pr, p, s, a, q: s.session_type or ""},
+    "session_statut": {"label": "Statut session", "getter": lambda pr, p, s, a, q: s.statut or ""},
     "session_heure_debut": {
         "label": "Heure début",
-        "getter": lambda ctx: ctx["session"].rdv_debut or ctx["session"].heure_debut or "",
+        "getter": lambda pr, p, s, a, q: s.rdv_debut or s.heure_debut or "",
     },
     "session_heure_fin": {
         "label": "Heure fin",
-        "getter": lambda ctx: ctx["session"].rdv_fin or ctx["session"].heure_fin or "",
+        "getter": lambda pr, p, s, a, q: s.rdv_fin or s.heure_fin or "",
     },
     "session_duree_minutes": {
         "label": "Durée (minutes)",
-        "getter": lambda ctx: ctx["session"].duree_minutes or "",
+        "getter": lambda pr, p, s, a, q: s.duree_minutes or "",
     },
-    "atelier_id": {"label": "ID atelier", "getter": lambda ctx: ctx["atelier"].id},
-    "atelier_nom": {"label": "Nom atelier", "getter": lambda ctx: ctx["atelier"].nom or ""},
-    "atelier_secteur": {"label": "Secteur atelier", "getter": lambda ctx: ctx["atelier"].secteur or ""},
-    "atelier_type": {"label": "Type atelier", "getter": lambda ctx: ctx["atelier"].type_atelier or ""},
-    "presence_id": {"label": "ID présence", "getter": lambda ctx: ctx["presence"].id},
-    "presence_motif": {"label": "Motif", "getter": lambda ctx: ctx["presence"].motif or ""},
-    "presence_motif_autre": {"label": "Motif autre", "getter": lambda ctx: ctx["presence"].motif_autre or ""},
+    "atelier_id": {"label": "ID atelier", "getter": lambda pr, p, s, a, q: a.id},
+    "atelier_nom": {"label": "Nom atelier", "getter": lambda pr, p, s, a, q: a.nom or ""},
+    "atelier_secteur": {"label": "Secteur atelier", "getter": lambda pr, p, s, a, q: a.secteur or ""},
+    "atelier_type": {"label": "Type atelier", "getter": lambda pr, p, s, a, q: a.type_atelier or ""},
+    "presence_id": {"label": "ID présence", "getter": lambda pr, p, s, a, q: pr.id},
+    "presence_motif": {"label": "Motif", "getter": lambda pr, p, s, a, q: pr.motif or ""},
+    "presence_motif_autre": {"label": "Motif autre", "getter": lambda pr, p, s, a, q: pr.motif_autre or ""},
     "presence_created_at": {
         "label": "Date d'émargement",
-        "getter": lambda ctx: _fmt_datetime(ctx["presence"].created_at),
+        "getter": lambda pr, p, s, a, q: _fmt_datetime(pr.created_at),
     },
 }
 
 
+@lru_cache(maxsize=64)
+def _csv_row_builder(fields: tuple[str, ...]):
+    """Fonction (pr, p, s, a, q) -> tuple des colonnes choisies, générée une fois par liste de champs.
+
+    Un appel direct par getter (g0(...), g1(...)...) au lieu d'une boucle par ligne.
+    Seuls des indices entrent dans le source généré ; les champs sont déjà validés contre CSV_FIELD_MAP.
+    """
+    ns = {f"g{i}": CSV_FIELD_MAP[f]["getter"] for i, f in enumerate(fields)}
+    calls = "".join(f"g{i}(pr, p, s, a, q), " for i in range(len(fields)))
+    exec(f"def build_row(pr, p, s, a, q):\n    return ({calls})", ns)
+    return ns["build_row"]
+
+
+def _can(perm: str) -> bool:
+    """can() mémorisé pour la durée de la requête (évite de reparcourir rôles/permissions)."""
+    cache = g.setdefault("_perm_cache", {})
+    if perm not in cache:
+        cache[perm] = can(perm)
+    return cache[perm]
+
+
 def _can_view() -> bool:
-    return can("statsimpact:view") or can("statsimpact:view_all")
+    if "_can_view" not in g:
+        g._can_view = _can("statsimpact:view") or _can("statsimpact:view_all")
+    return g._can_view
+
+
+def _request_filters():
+    """normalize_filters(request.args) calculé une fois par requête (partagé entre helpers)."""
+    if "_stats_flt" not in g:
+        g._stats_flt = normalize_filters(dict(request.args), user=current_user)
+    return g._stats_flt
+
+
+def _default_current_year(flt) -> None:
+    """Sans dates : année civile en cours (dashboard et export magato partagent la même clé de cache)."""
+    if not flt.date_from and not flt.date_to:
+        today = date.today()
+        flt.date_from = date(today.year, 1, 1)
+        flt.date_to = date(today.year, 12, 31)
+
+
+# Résultats récents de compute_magatomatique : {clé: (expiration monotonic, résultat)}
+_MAGATO_CACHE: dict[tuple, tuple[float, dict]] = {}
+_MAGATO_CACHE_MAX = 64
+_MAGATO_CACHE_LOCK = threading.Lock()
+
+
+def _cached_magatomatique(flt, *, refresh: bool = False, **kwargs) -> dict:
+    """compute_magatomatique avec cache mémoire court (STATS_MAGATO_CACHE_TTL secondes, 0 = désactivé).
+
+    Clé = utilisateur (périmètre secteur) + filtres + options. refresh=True recalcule et
+    met à jour l'entrée (dashboard), l'export xlsx qui suit réutilise alors le même résultat.
+    Le résultat est stocké tel quel (jamais modifié ensuite) ; seul un hit renvoie une copie,
+    l'appelant peut la modifier sans toucher au cache.
+    """
+    ttl = current_app.config.get("STATS_MAGATO_CACHE_TTL", 0)
+    if ttl <= 0:
+        return compute_magatomatique(flt, **kwargs)
+
+    key = (current_user.get_id(), astuple(flt), tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    if not refresh:
+        with _MAGATO_CACHE_LOCK:
+            hit = _MAGATO_CACHE.get(key)
+        if hit and hit[0] > now:
+            return deepcopy(hit[1])
+
+    result = compute_magatomatique(flt, **kwargs)
+    with _MAGATO_CACHE_LOCK:
+        for k in [k for k, (exp, _) in _MAGATO_CACHE.items() if exp <= now]:
+            del _MAGATO_CACHE[k]
+        _MAGATO_CACHE.pop(key, None)
+        while len(_MAGATO_CACHE) >= _MAGATO_CACHE_MAX:
+            del _MAGATO_CACHE[next(iter(_MAGATO_CACHE))]
+        _MAGATO_CACHE[key] = (now + ttl, result)
+    return result
+
+
+def _clear_magato_cache() -> None:
+    """Après une modification de participant : plus aucun export ne réutilise un calcul antérieur."""
+    with _MAGATO_CACHE_LOCK:
+        _MAGATO_CACHE.clear()
 
 
 def _safe_sheet_title(name: str, fallback: str = "Atelier") -> str:
@@ -180,7 +291,7 @@ def _safe_sheet_title(name: str, fallback: str = "Atelier") -> str:
 
 
 def _pedago_scope_secteur() -> str | None:
-    if can("scope:all_secteurs"):
+    if _can("scope:all_secteurs"):
         return None
     return (getattr(current_user, "secteur_assigne", None) or "").strip() or None
 
@@ -221,39 +332,94 @@ def _build_bilan_rows(participant: Participant) -> list[dict]:
 def _participants_success_rate(session_id: int, competences: list[Competence]) -> dict:
     if not competences:
         return {"total": 0, "success": 0, "ratio": 0}
-    presences = PresenceActivite.query.filter_by(session_id=session_id).all()
+    presences = db.session.query(PresenceActivite.participant_id).filter(PresenceActivite.session_id == session_id).all()
     total = len(presences)
     if total == 0:
         return {"total": 0, "success": 0, "ratio": 0}
     comp_ids = [c.id for c in competences]
-    success_count = 0
-    for pr in presences:
-        evals = (
-            Evaluation.query.filter(
-                Evaluation.session_id == session_id,
-                Evaluation.participant_id == pr.participant_id,
+    # Nb de compétences acquises par participant : 1 requête pour toute la session
+    acquired = dict(
+        db.session.query(Evaluation.participant_id, func.count(func.distinct(Evaluation.competence_id)))
+        .filter(
+            Evaluation.session_id == session_id,
+            Evaluation.competence_id.in_(comp_ids),
+            Evaluation.etat >= 2,
+        )
+        .group_by(Evaluation.participant_id)
+        .all()
+    )
+    success_count = sum(1 for (pid,) in presences if acquired.get(pid, 0) == len(comp_ids))
+    ratio = (success_count / total * 100) if total else 0
+    return {"total": total, "success": success_count, "ratio": ratio}
+
+
+def _operational_leaves(objectifs: list[Objectif]) -> list[Objectif]:
+    leaves, stack = [], list(objectifs)
+    while stack:
+        obj = stack.pop()
+        if obj.type == "operationnel" and obj.session_id:
+            leaves.append(obj)
+        else:
+            stack.extend(obj.enfants or [])
+    return leaves
+
+
+def _preload_success_rates(objectifs: list[Objectif]) -> dict[int, dict]:
+    """_participants_success_rate() of every operational leaf of the trees, in 2 queries.
+
+    Returns {objectif_id: stats}; pass it to _objective_success() so the walk
+    does not hit the database.
+    """
+    leaves = _operational_leaves(objectifs)
+    session_ids = {o.session_id for o in leaves}
+    comp_ids = {c.id for o in leaves for c in o.competences}
+    if not session_ids:
+        return {}
+
+    presences: dict[int, list[int]] = {}
+    for sid, pid in db.session.query(PresenceActivite.session_id, PresenceActivite.participant_id).filter(
+        PresenceActivite.session_id.in_(session_ids)
+    ):
+        presences.setdefault(sid, []).append(pid)
+
+    acquired: dict[tuple[int, int], set[int]] = {}
+    if comp_ids:
+        for sid, pid, cid in (
+            db.session.query(Evaluation.session_id, Evaluation.participant_id, Evaluation.competence_id)
+            .filter(
+                Evaluation.session_id.in_(session_ids),
                 Evaluation.competence_id.in_(comp_ids),
                 Evaluation.etat >= 2,
             )
             .distinct()
-            .count()
-        )
-        if evals == len(comp_ids):
-            success_count += 1
-    ratio = (success_count / total * 100) if total else 0
-    return {"total": total, "success": success_count, "ratio": ratio}
+        ):
+            acquired.setdefault((sid, pid), set()).add(cid)
+
+    rates = {}
+    for obj in leaves:
+        wanted = {c.id for c in obj.competences}
+        pids = presences.get(obj.session_id, [])
+        if not wanted or not pids:
+            rates[obj.id] = {"total": 0, "success": 0, "ratio": 0}
+            continue
+        success_count = sum(1 for pid in pids if wanted <= acquired.get((obj.session_id, pid), set()))
+        rates[obj.id] = {"total": len(pids), "success": success_count, "ratio": success_count / len(pids) * 100}
+    return rates
 
 
-def _objective_success(obj: Objectif) -> dict:
+def _objective_success(obj: Objectif, rates: dict[int, dict] | None = None) -> dict:
     if obj.type == "operationnel" and obj.session_id:
-        stats = _participants_success_rate(obj.session_id, obj.competences)
+        if rates is not None and obj.id in rates:
+            stats = rates[obj.id]
+        else:
+            stats = _participants_success_rate(obj.session_id, obj.competences)
         validated = stats["ratio"] >= (obj.seuil_validation or 0)
         return {"ratio": stats["ratio"], "validated": validated, "total": stats["total"], "success": stats["success"]}
 
     enfants = obj.enfants or []
     if not enfants:
         return {"ratio": 0, "validated": False, "total": 0, "success": 0}
-    results = [ _objective_success(child) for child in enfants ]
+    results = [ _objective_success(child, rates) for child in enfants ]
     total = len(results)
     success = sum(1 for r in results if r["validated"])
     ratio = (success / total * 100) if total else 0
@@ -278,16 +444,27 @@ def _query_presence_export(flt, participant_q: str | None = None):
     query = _apply_common_filters(query, flt)
 
     if participant_q:
-        like = f"%{participant_q.lower()}%"
-        query = query.filter(
-            func.lower(func.coalesce(Participant.nom, "")).like(like)
-            | func.lower(func.coalesce(Participant.prenom, "")).like(like)
-        )
+        query = query.filter(_participant_name_filter(participant_q))
 
     query = query.order_by(_session_date_expr().asc(), Participant.nom.asc(), Participant.prenom.asc())
     return query
 
 
+def _get_in_scope(model, obj_id: int | None, secteur: str | None, hydrate: bool = True):
+    """403 if the row's secteur is outside `secteur`; returns the object only when hydrate."""
+    if not obj_id:
+        return None
+    if hydrate:
+        obj = db.session.get(model, obj_id)
+        obj_secteur = obj.secteur if obj else None
+    else:
+        obj = None
+        obj_secteur = db.session.query(model.secteur).filter(model.id == obj_id).scalar()
+    if obj_secteur is not None and secteur and obj_secteur != secteur:
+        abort(403)
+    return obj
+
+
 @bp.route("/stats/pedagogie", methods=["GET"])
 @login_required
 def stats_pedagogie():
@@ -296,43 +473,70 @@ def stats_pedagogie():
 
     secteur = _pedago_scope_secteur()
 
-    projets_q = Projet.query
-    ateliers_q = AtelierActivite.query.filter(AtelierActivite.is_deleted.is_(False))
-    if secteur:
-        projets_q = projets_q.filter(Projet.secteur == secteur)
-        ateliers_q = ateliers_q.filter(AtelierActivite.secteur == secteur)
-
-    projets = projets_q.order_by(Projet.secteur.asc(), Projet.nom.asc()).all()
-    ateliers = ateliers_q.order_by(AtelierActivite.secteur.asc(), AtelierActivite.nom.asc()).all()
-    participants = Participant.query.order_by(Participant.nom.asc(), Participant.prenom.asc()).all()
+    # Listes des <select> : seul l'onglet affiché en a besoin, et (id, libellés) suffisent
+    tab = request.args.get("tab", "projet")
+    projets, ateliers, participants = [], [], []
+    if tab == "projet":
+        projets_q = db.session.query(Projet.id, Projet.secteur, Projet.nom)
+        if secteur:
+            projets_q = projets_q.filter(Projet.secteur == secteur)
+        projets = projets_q.order_by(Projet.secteur.asc(), Projet.nom.asc()).all()
+    elif tab == "atelier":
+        ateliers_q = db.session.query(AtelierActivite.id, AtelierActivite.secteur, AtelierActivite.nom).filter(
+            AtelierActivite.is_deleted.is_(False)
+        )
+        if secteur:
+            ateliers_q = ateliers_q.filter(AtelierActivite.secteur == secteur)
+        ateliers = ateliers_q.order_by(AtelierActivite.secteur.asc(), AtelierActivite.nom.asc()).all()
+    elif tab == "participant":
+        participants = (
+            db.session.query(Participant.id, Participant.nom, Participant.prenom)
+            .order_by(Participant.nom.asc(), Participant.prenom.asc())
+            .all()
+        )
 
     projet_id = request.args.get("projet_id", type=int)
     atelier_id = request.args.get("atelier_id", type=int)
     participant_id = request.args.get("participant_id", type=int)
 
-    projet = Projet.query.get(projet_id) if projet_id else None
-    if projet and secteur and projet.secteur != secteur:
-        abort(403)
-
-    atelier = AtelierActivite.query.get(atelier_id) if atelier_id else None
-    if atelier and secteur and atelier.secteur != secteur:
-        abort(403)
-
-    participant = Participant.query.get(participant_id) if participant_id else None
+    # contrôle de secteur sur la seule colonne ; objet complet uniquement pour l'onglet affiché
+    projet = _get_in_scope(Projet, projet_id, secteur, hydrate=tab == "projet")
+    atelier = _get_in_scope(AtelierActivite, atelier_id, secteur, hydrate=tab == "atelier")
+    participant = db.session.get(Participant, participant_id) if participant_id and tab == "participant" else None
 
     projet_objectifs = []
     if projet:
-        objectifs = Objectif.query.filter_by(projet_id=projet.id, type="general").order_by(Objectif.created_at.asc()).all()
+        # arbre général -> spécifiques -> opérationnels chargé d'un coup
+        objectifs = (
+            Objectif.query.options(
+                selectinload(Objectif.competences),
+                selectinload(Objectif.enfants).selectinload(Objectif.competences),
+                selectinload(Objectif.enfants).selectinload(Objectif.enfants).selectinload(Objectif.competences),
+            )
+            .filter_by(projet_id=projet.id, type="general")
+            .order_by(Objectif.created_at.asc())
+            .all()
+        )
+        rates = _preload_success_rates(objectifs)
         for obj in objectifs:
-            stats = _objective_success(obj)
+            stats = _objective_success(obj, rates)
             projet_objectifs.append({"objectif": obj, **stats})
 
     atelier_stats = {}
     if atelier:
-        objectifs = Objectif.query.filter_by(atelier_id=atelier.id, type="specifique").order_by(Objectif.created_at.asc()).all()
+        objectifs = (
+            Objectif.query.options(
+                selectinload(Objectif.competences),
+                selectinload(Objectif.enfants).selectinload(Objectif.competences),
+            )
+            .filter_by(atelier_id=atelier.id, type="specifique")
+            .order_by(Objectif.created_at.asc())
+            .all()
+        )
+        rates = _preload_success_rates(objectifs)
         objectifs_stats = []
         for obj in objectifs:
-            stats = _objective_success(obj)
+            stats = _objective_success(obj, rates)
             objectifs_stats.append({"objectif": obj, **stats})
         atelier_stats = {"objectifs": objectifs_stats}
 
@@ -340,11 +544,9 @@ def stats_pedagogie():
     bilan_rows = []
     if participant:
         bilan_rows = _build_bilan_rows(participant)
-        grouped: dict[str, list[dict]] = {}
-        for row in bilan_rows:
-            grouped.setdefault(row["referentiel"], []).append(row)
+        # lignes déjà triées par référentiel (ORDER BY Referentiel.nom) : groupby suffit
         participant_groups = [
-            {"referentiel": ref, "rows": rows} for ref, rows in grouped.items()
+            {"referentiel": ref, "rows": list(rows)} for ref, rows in groupby(bilan_rows, key=itemgetter("referentiel"))
         ]
 
     return render_template(
@@ -366,7 +568,7 @@ def stats_pedagogie():
 def stats_pedagogie_bilan(participant_id: int):
     if not _can_view():
         abort(403)
-    participant = Participant.query.get_or_404(participant_id)
+    participant = db.get_or_404(Participant, participant_id)
     rows = _build_bilan_rows(participant)
     pdf_path = generate_participant_bilan_pdf(current_app, participant, rows)
     if pdf_path and os.path.exists(pdf_path):
@@ -375,12 +577,141 @@ def stats_pedagogie_bilan(participant_id: int):
     return redirect(url_for("statsimpact.stats_pedagogie", participant_id=participant_id))
 
 
-def _build_magato_per_atelier_workbook(flt) -> Workbook:
+@lru_cache(maxsize=1)
+def _openpyxl():
+    """openpyxl importé au premier export xlsx plutôt qu'au démarrage (dashboard / CSV n'en ont pas besoin).
+
+    Renvoie (Workbook, get_column_letter, ColumnDimension).
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.dimensions import ColumnDimension
+
+    return Workbook, get_column_letter, ColumnDimension
+
+
+@lru_cache(maxsize=1)
+def _xlsxwriter():
+    """Module xlsxwriter (optionnel, STATS_XLSX_ENGINE=xlsxwriter) ou None s'il n'est pas installé."""
+    try:
+        import xlsxwriter
+    except Exception:  # pragma: no cover
+        return None
+    return xlsxwriter
+
+
+# Au-delà, le fichier xlsx généré passe de la mémoire à un fichier temporaire
+_XLSX_SPOOL_MAX = 8 * 1024 * 1024
+
+
+class _XlsxWriterSheet:
+    """append() à la openpyxl sur une feuille xlsxwriter (lignes écrites dans l'ordre)."""
+
+    def __init__(self, ws):
+        self._ws = ws
+        self._row = 0
+
+    def append(self, values) -> None:
+        self._ws.write_row(self._row, 0, values)
+        self._row += 1
+
+    def set_width(self, first_col: int, last_col: int, width: float) -> None:
+        self._ws.set_column(first_col - 1, last_col - 1, width)
+
+
+class _XlsxWriterBook:
+    """Workbook xlsxwriter en constant_memory (une seule ligne par feuille gardée en RAM).
+
+    xlsxwriter écrit le zip directement dans son fichier temporaire "spooled" (output),
+    envoyé tel quel par _send_xlsx : pas de recopie du fichier généré.
+    """
+
+    def __init__(self):
+        self.output = SpooledTemporaryFile(max_size=_XLSX_SPOOL_MAX, suffix=".xlsx")
+        self._wb = _xlsxwriter().Workbook(self.output, {"constant_memory": True, "strings_to_numbers": False})
+        self._titles: set[str] = set()
+
+    def create_sheet(self, title: str) -> _XlsxWriterSheet:
+        return _XlsxWriterSheet(self._wb.add_worksheet(unique_sheet_title(title, self._titles)))
+
+    def close(self) -> None:
+        self._wb.close()
+
+
+def _new_export_workbook():
+    """Workbook en écriture seule selon STATS_XLSX_ENGINE : "xml" (XML direct), "xlsxwriter"
+    (si installé), sinon openpyxl write_only."""
+    engine = current_app.config.get("STATS_XLSX_ENGINE")
+    if engine == "xml":
+        return RawWorkbook()
+    if engine == "xlsxwriter" and _xlsxwriter() is not None:
+        return _XlsxWriterBook()
+    return _openpyxl()[0](write_only=True)
+
+
+@lru_cache(maxsize=1)
+def _xlsx_process_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool de processus partagé pour le rendu XML des feuilles (créé au premier export).
+
+    "spawn" : pas de fork d'un serveur multi-thread (connexions DB, verrous hérités).
+    Les fils ré-importent le script __main__ : il ne doit pas créer l'app au niveau module
+    (run_waitress.py importe wsgi sous if __name__ == "__main__").
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _set_column_widths(ws, widths: dict[int, float]) -> None:
+    """Largeurs par n° de colonne (1-based) ; à appeler avant la 1ère ligne.
+
+    Colonnes contiguës de même largeur = une seule plage (un <col min max>), pas un objet par colonne.
+    """
+    for first, last, width in width_runs(widths):
+        if isinstance(ws, (_XlsxWriterSheet, RawSheet)):
+            ws.set_width(first, last, width)
+        else:
+            _, get_column_letter, ColumnDimension = _openpyxl()
+            letter = get_column_letter(first)
+            ws.column_dimensions[letter] = ColumnDimension(ws, index=letter, min=first, max=last, width=width)
+
+
+def _send_xlsx(wb, filename: str):
+    """Enregistre le workbook dans un fichier temporaire "spooled" et l'envoie en pièce jointe."""
+    if isinstance(wb, _XlsxWriterBook):
+        wb.close()
+        tmp = wb.output
+        tmp.seek(0, 2)
+    else:
+        tmp = SpooledTemporaryFile(max_size=_XLSX_SPOOL_MAX, suffix=".xlsx")
+        wb.save(tmp)
+    size = tmp.tell()
+    tmp.seek(0)
+    resp = send_file(
+        tmp,
+        as_attachment=True,
+        download_name=filename,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        max_age=0,
+    )
+    resp.content_length = size
+    return resp
+
+
+# Chiffre binaire du masque de présences -> valeur de cellule de la feuille Matrice
+_MATRIX_CELL = {"0": "", "1": "1"}
+
+
+def _session_header_labels(sessions) -> list[str]:
+    """En-têtes de colonnes "jj/mm/aaaa" pour des tuples (id, rdv_date, date_session)."""
+    fmt = "%d/%m/%Y"
+    return [d.strftime(fmt) if (d := (rdv or ds)) else "Sans date" for _, rdv, ds in sessions]
+
+
+def _build_magato_per_atelier_workbook(flt):
     """Export annuel type "Excel historique" : 1 feuille par atelier (matrice participants x sessions)."""
 
     # Cloisonnement : un responsable_secteur ne doit exporter que son secteur
     eff_secteur = flt.secteur
-    if not can("scope:all_secteurs"):
+    if not _can("scope:all_secteurs"):
         eff_secteur = (getattr(current_user, "secteur_assigne", None) or "").strip() or eff_secteur
 
     # Liste des ateliers dans le périmètre
@@ -389,110 +720,180 @@ def _build_magato_per_atelier_workbook(flt) -> Workbook:
         aq = aq.filter(AtelierActivite.secteur == eff_secteur)
     ateliers = aq.order_by(AtelierActivite.secteur.asc(), AtelierActivite.nom.asc()).all()
 
-    wb = Workbook()
-    # on réutilise la 1ère feuille pour une synthèse
-    ws0 = wb.active
-    ws0.title = "Synthese"
-    ws0.append(["Export annuel : 1 feuille par atelier"])
-    ws0.append(["Secteur", "Atelier", "Nb sessions", "Nb présences", "Participants uniques", "Nouveaux", "Récurrents"])
+    # écriture seule : les lignes partent directement dans le fichier (pas de cellules en mémoire)
+    wb = _new_export_workbook()
+    ws0 = wb.create_sheet("Synthese")
+    ws0.append(("Export annuel : 1 feuille par atelier",))
+    ws0.append(("Secteur", "Atelier", "Nb sessions", "Nb présences", "Participants uniques", "Nouveaux", "Récurrents"))
+
+    # 4 requêtes pour tous les ateliers (au lieu de 4 par atelier), regroupées par atelier_id ensuite
+    session_date = func.coalesce(SessionActivite.rdv_date, SessionActivite.date_session)
+    sess_filters = [SessionActivite.atelier_id.in_([at.id for at in ateliers])]
+    # filtre dates (inclusif)
+    if flt.date_from:
+        sess_filters.append(session_date >= flt.date_from)
+    if flt.date_to:
+        sess_filters.append(session_date <= flt.date_to)
+
+    # Sessions de la période : tuples (id, rdv_date, date_session), pas d'instances ORM
+    sessions_by_atelier: dict[int, list[tuple]] = {}
+    for sid, aid, rdv, ds in (
+        db.session.query(SessionActivite.id, SessionActivite.atelier_id, SessionActivite.rdv_date, SessionActivite.date_session)
+        .filter(*sess_filters)
+        .order_by(session_date.asc(), SessionActivite.id.asc())
+    ):
+        sessions_by_atelier.setdefault(aid, []).append((sid, rdv, ds))
+
+    # Presences : atelier -> {pid: sessions suivies}, rempli en un seul passage
+    present_by_atelier: dict[int, dict[int, set[int]]] = {}
+    pres_count: dict[int, int] = {}
+    for aid, pid, sid in (
+        db.session.query(SessionActivite.atelier_id, PresenceActivite.participant_id, PresenceActivite.session_id)
+        .join(SessionActivite, PresenceActivite.session_id == SessionActivite.id)
+        .filter(*sess_filters)
+    ):
+        pres_count[aid] = pres_count.get(aid, 0) + 1
+        by_pid = present_by_atelier.setdefault(aid, {})
+        if pid is not None:
+            by_pid.setdefault(pid, set()).add(sid)
+
+    # Participants (id, nom, prénom) ; rang = ordre nom/prénom
+    all_pids = {pid for by_pid in present_by_atelier.values() for pid in by_pid}
+    parts_by_id = {}
+    if all_pids:
+        parts_by_id = {
+            pid: (rank, nom, prenom)
+            for rank, (pid, nom, prenom) in enumerate(
+                db.session.query(Participant.id, Participant.nom, Participant.prenom)
+                .filter(Participant.id.in_(all_pids))
+                .order_by(Participant.nom.asc(), Participant.prenom.asc())
+            )
+        }
 
-    for at in ateliers:
-        # Sessions de l'atelier dans la période
-        sess_q = (
-            db.session.query(SessionActivite)
-            .filter(SessionActivite.atelier_id == at.id)
+    # KPI nouveaux/récurrents agrégés côté SQL (comptes / 1ère date par atelier x participant)
+    counts = (
+        db.session.query(
+            SessionActivite.atelier_id.label("aid"),
+            func.count(PresenceActivite.id).label("nb"),
+            func.min(session_date).label("first"),
         )
-        # filtre dates (inclusif)
-        if flt.date_from:
-            sess_q = sess_q.filter(func.coalesce(SessionActivite.rdv_date, SessionActivite.date_session) >= flt.date_from)
-        if flt.date_to:
-            sess_q = sess_q.filter(func.coalesce(SessionActivite.rdv_date, SessionActivite.date_session) <= flt.date_to)
-        sess_q = sess_q.order_by(func.coalesce(SessionActivite.rdv_date, SessionActivite.date_session).asc(), SessionActivite.id.asc())
-        sessions = sess_q.all()
+        .select_from(PresenceActivite)
+        .join(SessionActivite, PresenceActivite.session_id == SessionActivite.id)
+        .filter(*sess_filters, PresenceActivite.participant_id.isnot(None))
+        .group_by(SessionActivite.atelier_id, PresenceActivite.participant_id)
+        .subquery()
+    )
+    if flt.date_from and flt.date_to:
+        is_new = case((counts.c.first.between(flt.date_from, flt.date_to), 1), else_=0)
+    else:
+        is_new = literal(0)
+    kpis = {
+        aid: (recurring, new_count)
+        for aid, recurring, new_count in db.session.query(
+            counts.c.aid,
+            func.coalesce(func.sum(case((counts.c.nb >= 2, 1), else_=0)), 0),
+            func.coalesce(func.sum(is_new), 0),
+        ).group_by(counts.c.aid)
+    }
+
+    # Feuilles atelier : (titre, (ligne titre, en-têtes, ids sessions, [(nom, prénom, sessions suivies)], largeurs))
+    sheets: list[tuple[str, tuple]] = []
+    for at in ateliers:
+        sessions = sessions_by_atelier.get(at.id)
         if not sessions:
             # atelier sans sessions dans la période -> on le garde dans la synthèse avec 0
-            ws0.append([at.secteur, at.nom, 0, 0, 0, 0, 0])
+            ws0.append((at.secteur, at.nom, 0, 0, 0, 0, 0))
             continue
 
-        session_ids = [s.id for s in sessions]
+        session_ids = [sid for sid, _, _ in sessions]
+        header_labels = _session_header_labels(sessions)
+        title_line = f"{at.secteur} — {at.nom}"
 
-        # Presences (pairs pid/sid)
-        pres_rows = (
-            db.session.query(PresenceActivite.participant_id, PresenceActivite.session_id)
-            .filter(PresenceActivite.session_id.in_(session_ids))
-            .all()
-        )
-        if not pres_rows:
-            ws0.append([at.secteur, at.nom, len(sessions), 0, 0, 0, 0])
+        nb_presences = pres_count.get(at.id, 0)
+        if not nb_presences:
+            ws0.append((at.secteur, at.nom, len(sessions), 0, 0, 0, 0))
             # feuille vide mais structurée
-            ws = wb.create_sheet(_safe_sheet_title(f"{at.nom}"))
-            ws.append([f"{at.secteur} — {at.nom}"])
-            ws.append(["Nom", "Prénom"] + [( ( (s.rdv_date or s.date_session).strftime("%d/%m/%Y") ) if (s.rdv_date or s.date_session) else "Sans date") for s in sessions])
+            sheets.append((_safe_sheet_title(f"{at.nom}"), (title_line, header_labels, session_ids, [], None)))
             continue
 
-        pid_set = sorted({int(pid) for (pid, _) in pres_rows if pid is not None})
+        present = present_by_atelier[at.id]
+        parts = sorted((parts_by_id[pid] + (pid,) for pid in present if pid in parts_by_id))
+        recurring, new_count = kpis.get(at.id, (0, 0))
 
-        # Participants (id, nom, prénom)
-        parts = (
-            db.session.query(Participant.id, Participant.nom, Participant.prenom)
-            .filter(Participant.id.in_(pid_set))
-            .order_by(Participant.nom.asc(), Participant.prenom.asc())
-            .all()
-        )
+        ws0.append((at.secteur, at.nom, len(sessions), nb_presences, len(present), new_count, recurring))
 
-        # Comptes / min date par participant pour KPI nouveaux/récurrents
-        counts = (
-            db.session.query(
-                PresenceActivite.participant_id.label("pid"),
-                func.count(PresenceActivite.id).label("nb"),
-                func.min(func.coalesce(SessionActivite.rdv_date, SessionActivite.date_session)).label("first"),
-            )
-            .select_from(PresenceActivite)
-            .join(SessionActivite, PresenceActivite.session_id == SessionActivite.id)
-            .filter(PresenceActivite.session_id.in_(session_ids))
-            .group_by(PresenceActivite.participant_id)
-            .all()
+        # Matrice ; largeurs raisonnables (en écriture seule, posées avant la 1ère ligne)
+        widths = {1: 20, 2: 18, **{col_idx: 12 for col_idx in range(3, len(sessions) + 3)}}
+        people = [(nom, prenom, present[pid]) for _, nom, prenom, pid in parts]
+        sheets.append((_safe_sheet_title(f"{at.nom}"), (title_line, header_labels, session_ids, people, widths)))
+
+    # Moteur "xml" + STATS_XLSX_PROCESSES > 1 : XML des feuilles rendu en parallèle dans des processus
+    workers = current_app.config.get("STATS_XLSX_PROCESSES", 0)
+    if isinstance(wb, RawWorkbook) and workers > 1 and len(sheets) > 1:
+        try:
+            rendered = list(_xlsx_process_pool(workers).map(render_atelier_sheet, *zip(*(args for _, args in sheets))))
+        except Exception:
+            # pool cassé (processus tué, spawn impossible...) : rendu en série dans ce processus
+            current_app.logger.exception("Rendu parallèle des feuilles xlsx impossible, rendu en série")
+            _xlsx_process_pool.cache_clear()
+            rendered = [render_atelier_sheet(*args) for _, args in sheets]
+        for (title, _), xml in zip(sheets, rendered):
+            wb.add_sheet_xml(title, xml)
+        return wb
+
+    for title, (title_line, header_labels, session_ids, people, widths) in sheets:
+        ws = wb.create_sheet(title)
+        if widths:
+            _set_column_widths(ws, widths)
+        for row in atelier_sheet_rows(title_line, header_labels, session_ids, people):
+            ws.append(row)
+
+    return wb
+
+
+def _available_years(eff_secteur: str | None) -> list[int]:
+    """Années ayant au moins une session (ateliers actifs), de la plus récente à la plus ancienne.
+
+    DISTINCT sur la date brute (index ix_session_activite_date) puis année calculée
+    côté Python : extract(year, ...) empêcherait l'usage de l'index. Mémorisé sur g.
+    """
+    cache = g.setdefault("_years_cache", {})
+    key = (getattr(current_user, "id", None), eff_secteur)
+    if key not in cache:
+        session_date = func.coalesce(SessionActivite.rdv_date, SessionActivite.date_session)
+        dates_q = (
+            db.session.query(session_date)
+            .select_from(SessionActivite)
+            .join(AtelierActivite, SessionActivite.atelier_id == AtelierActivite.id)
+            .filter(AtelierActivite.is_deleted.is_(False))
         )
-        c_map = {int(r.pid): {"nb": int(r.nb or 0), "first": r.first} for r in counts if r and r.pid is not None}
-        new_count = 0
-        recurring = 0
-        for pid in pid_set:
-            nb = int(c_map.get(pid, {}).get("nb", 0))
-            if nb >= 2:
-                recurring += 1
-            fd = c_map.get(pid, {}).get("first")
-            if fd and flt.date_from and flt.date_to and flt.date_from <= fd <= flt.date_to:
-                new_count += 1
-
-        ws0.append([at.secteur, at.nom, len(sessions), len(pres_rows), len(pid_set), new_count, recurring])
-
-        # Matrice
-        ws = wb.create_sheet(_safe_sheet_title(f"{at.nom}"))
-        ws.append([f"{at.secteur} — {at.nom}"])
-        headers = ["Nom", "Prénom"] + [
-            ((d.strftime("%d/%m/%Y")) if (d := (s.rdv_date or s.date_session)) else "Sans date")
-            for s in sessions
-        ]
-        ws.append(headers)
+        if eff_secteur:
+            dates_q = dates_q.filter(AtelierActivite.secteur == eff_secteur)
+        cache[key] = sorted({d.year for (d,) in dates_q.distinct() if d}, reverse=True)
+    return cache[key]
 
-        # index session -> col offset
-        sid_index = {int(s.id): idx for idx, s in enumerate(sessions)}
-        present = set((int(pid), int(sid)) for (pid, sid) in pres_rows if pid is not None and sid is not None)
 
-        for pid, nom, prenom in parts:
-            row = [nom or "", prenom or ""] + [""] * len(sessions)
-            for sid, idx in sid_index.items():
-                if (int(pid), int(sid)) in present:
-                    row[2 + idx] = "1"
-            ws.append(row)
+def _remove_file_quiet(path: str) -> None:
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except Exception:
+        pass
 
-        # Largeurs raisonnables
-        ws.column_dimensions[get_column_letter(1)].width = 20
-        ws.column_dimensions[get_column_letter(2)].width = 18
-        for col_idx in range(3, len(headers) + 1):
-            ws.column_dimensions[get_column_letter(col_idx)].width = 12
 
-    return wb
+def _remove_files(paths: list[str]) -> None:
+    """Suppression best-effort de fichiers (en parallèle au-delà de quelques-uns)."""
+    if len(paths) <= 4:
+        for path in paths:
+            _remove_file_quiet(path)
+        return
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_remove_file_quiet, paths))
+
+
+def _redirect_participants_tab():
+    """Retour au tableau de bord (onglet participants) en conservant les filtres."""
+    return redirect(url_for("statsimpact.dashboard", **{**request.args.to_dict(flat=True), "tab": "participants"}))
 
 
 @bp.route("/stats-impact", methods=["GET", "POST"])
@@ -501,18 +902,13 @@ def dashboard():
     if not _can_view():
         abort(403)
 
-    args = dict(request.args)
-
-    # Robust: normalize_filters supports both dict-style and kwargs-style.
-    flt = normalize_filters(args, user=current_user)
+    flt = _request_filters()
 
     # Default: current year if no dates
-    if not flt.date_from and not flt.date_to:
-        today = date.today()
-        flt.date_from = date(today.year, 1, 1)
-        flt.date_to = date(today.year, 12, 31)
+    _default_current_year(flt)
 
-    # Pre-compute participants for access control if we need to handle edits.
+    # Calculé une seule fois : sert au contrôle d'accès des éditions puis à l'affichage
+    # (les actions POST qui modifient redirigent, pas de recalcul nécessaire).
     participants = compute_participants_stats(flt)
 
     if request.method == "POST":
@@ -527,17 +923,21 @@ def dashboard():
             if not participant_id or participant_id not in allowed_ids:
                 abort(403)
 
-            participant = Participant.query.get(participant_id)
-            if not participant:
-                abort(404)
-
-            participant.nom = (request.form.get("nom") or participant.nom or "").strip() or participant.nom
-            participant.prenom = (request.form.get("prenom") or participant.prenom or "").strip() or participant.prenom
-            participant.ville = (request.form.get("ville") or "").strip() or None
-            participant.email = (request.form.get("email") or "").strip() or None
-            participant.telephone = (request.form.get("telephone") or "").strip() or None
-            participant.genre = (request.form.get("genre") or "").strip() or None
-            participant.type_public = (request.form.get("type_public") or participant.type_public or "H").strip().upper()
+            # Un seul UPDATE ... RETURNING (pas de SELECT préalable). Champ vide du
+            # formulaire = valeur actuelle conservée, calculée côté SQL.
+            values = {}
+            for col in ("nom", "prenom"):
+                raw = (request.form.get(col) or "").strip()
+                column = getattr(Participant, col)
+                values[col] = raw or func.coalesce(func.nullif(func.trim(column), ""), column)
+            for col in ("ville", "email", "telephone", "genre"):
+                values[col] = (request.form.get(col) or "").strip() or None
+            raw_type = request.form.get("type_public")
+            values["type_public"] = (
+                raw_type.strip().upper()
+                if raw_type
+                else func.upper(func.trim(func.coalesce(func.nullif(Participant.type_public, ""), "H")))
+            )
 
             dn_raw = request.form.get("date_naissance") or None
             dn = None
@@ -546,26 +946,31 @@ def dashboard():
                     dn = date.fromisoformat(dn_raw)
                 except Exception:
                     dn = None
-            participant.date_naissance = dn
+            values["date_naissance"] = dn
 
             quartier_id = request.form.get("quartier_id") or None
             try:
-                participant.quartier_id = int(quartier_id) if quartier_id else None
+                values["quartier_id"] = int(quartier_id) if quartier_id else None
             except Exception:
-                participant.quartier_id = None
+                values["quartier_id"] = None
 
             try:
-                from app.extensions import db
-
+                updated = db.session.execute(
+                    update(Participant).where(Participant.id == participant_id).values(**values).returning(Participant.id)
+                ).first()
+                if not updated:
+                    db.session.rollback()
+                    abort(404)
                 db.session.commit()
+                _clear_magato_cache()
                 flash("Participant mis à jour.", "success")
+            except HTTPException:
+                raise
             except Exception:
                 db.session.rollback()
                 flash("Impossible de sauvegarder ce participant.", "danger")
 
-            args_redirect = request.args.to_dict(flat=True)
-            args_redirect["tab"] = "participants"
-            return redirect(url_for("statsimpact.dashboard", **args_redirect))
+            return _redirect_participants_tab()
 
         if action == "delete_participant":
             try:
@@ -577,14 +982,13 @@ def dashboard():
             if not participant_id or participant_id not in allowed_ids:
                 abort(403)
 
-            participant = Participant.query.get(participant_id)
-            if not participant:
+            if db.session.query(Participant.id).filter(Participant.id == participant_id).first() is None:
                 abort(404)
 
             # Sécurité secteur: un responsable_secteur ne peut purger un participant
             # que si ce participant n'a des présences que dans SON secteur (ou aucune).
             user_secteur = (getattr(current_user, "secteur_assigne", None) or "").strip()
-            if not can("participants:view_all"):
+            if not _can("participants:view_all"):
                 sectors = (
                     PresenceActivite.query.join(SessionActivite, PresenceActivite.session_id == SessionActivite.id)
                     .with_entities(SessionActivite.secteur)
@@ -599,37 +1003,30 @@ def dashboard():
                         "Suppression refusée : ce participant a des émargements dans d'autres secteurs.",
                         "danger",
                     )
-                    args_redirect = request.args.to_dict(flat=True)
-                    args_redirect["tab"] = "participants"
-                    return redirect(url_for("statsimpact.dashboard", **args_redirect))
+                    return _redirect_participants_tab()
 
             try:
-                from app.extensions import db
-
-                # Supprime d'abord les signatures des présences
-                presences = PresenceActivite.query.filter_by(participant_id=participant_id).all()
-                for pr in presences:
-                    if pr.signature_path:
-                        try:
-                            if os.path.exists(pr.signature_path):
-                                os.remove(pr.signature_path)
-                        except Exception:
-                            pass
-                    db.session.delete(pr)
-
-                db.session.delete(participant)
+                # 2 DELETE en une transaction ; fichiers signature supprimés après le commit
+                signature_paths = [
+                    path
+                    for (path,) in db.session.query(PresenceActivite.signature_path).filter(
+                        PresenceActivite.participant_id == participant_id,
+                        PresenceActivite.signature_path.isnot(None),
+                    )
+                    if path
+                ]
+                db.session.execute(delete(PresenceActivite).where(PresenceActivite.participant_id == participant_id))
+                db.session.execute(delete(Participant).where(Participant.id == participant_id))
                 db.session.commit()
+                _clear_magato_cache()
+                _remove_files(signature_paths)
                 flash("Participant supprimé définitivement.", "success")
             except Exception:
                 db.session.rollback()
                 flash("Impossible de supprimer ce participant.", "danger")
 
-            args_redirect = request.args.to_dict(flat=True)
-            args_redirect["tab"] = "participants"
-            return redirect(url_for("statsimpact.dashboard", **args_redirect))
+            return _redirect_participants_tab()
 
-    # Refresh computed stats after any potential mutation
-    participants = compute_participants_stats(flt)
     stats = compute_volume_activity_stats(flt)
     freq = compute_participation_frequency_stats(flt)
     trans = compute_transversalite_stats(flt)
@@ -655,18 +1052,17 @@ def dashboard():
         max_sessions = max(5, min(max_sessions, 200))
         max_participants = max(20, min(max_participants, 1000))
 
-        magato = compute_magatomatique(
+        magato = _cached_magatomatique(
             flt,
+            refresh=True,
             participant_q=participant_q,
             view=view,
             max_sessions=max_sessions,
             max_participants=max_participants,
         )
 
-    participants = compute_participants_stats(flt)
-
     secteurs = []
-    if can("statsimpact:view_all") or can("scope:all_secteurs"):
+    if _can("statsimpact:view_all") or _can("scope:all_secteurs"):
         secteurs = [
             s[0]
             for s in (
@@ -689,19 +1085,9 @@ def dashboard():
     # Années disponibles (pour presets "année") dans le périmètre accessible
     try:
         eff_secteur = flt.secteur
-        if not can("scope:all_secteurs"):
+        if not _can("scope:all_secteurs"):
             eff_secteur = (getattr(current_user, "secteur_assigne", None) or "").strip() or eff_secteur
-
-        year_expr = func.extract("year", func.coalesce(SessionActivite.rdv_date, SessionActivite.date_session))
-        years_q = (
-            db.session.query(year_expr.label("y"))
-            .select_from(SessionActivite)
-            .join(AtelierActivite, SessionActivite.atelier_id == AtelierActivite.id)
-            .filter(AtelierActivite.is_deleted.is_(False))
-        )
-        if eff_secteur:
-            years_q = years_q.filter(AtelierActivite.secteur == eff_secteur)
-        years = [int(r.y) for r in years_q.distinct().order_by(year_expr.desc()).all() if r and r.y]
+        years = _available_years(eff_secteur)
     except Exception:
         years = []
 
@@ -731,7 +1117,7 @@ def magatomatique_export_csv():
     if not _can_view():
         abort(403)
 
-    flt = normalize_filters(dict(request.args), user=current_user)
+    flt = _request_filters()
     participant_q = (request.args.get("participant_q") or "").strip() or None
 
     fields = request.args.getlist("fields")
@@ -742,23 +1128,20 @@ def magatomatique_export_csv():
         fields = list(CSV_DEFAULT_FIELDS)
 
     query = _query_presence_export(flt, participant_q=participant_q)
+    build_row = _csv_row_builder(tuple(fields))
 
-    output = StringIO()
-    writer = csv.writer(output, delimiter=";")
-    writer.writerow([CSV_FIELD_MAP[f]["label"] for f in fields])
-
-    for presence, participant, session, atelier, quartier in query.all():
-        ctx = {
-            "presence": presence,
-            "participant": participant,
-            "session": session,
-            "atelier": atelier,
-            "quartier": quartier,
-        }
-        writer.writerow([CSV_FIELD_MAP[f]["getter"](ctx) for f in fields])
+    def generate():
+        # Streaming : une ligne CSV à la fois, lecture SQL par lots
+        writer = csv.writer(_CsvLine(), delimiter=";")
+        yield "\ufeff"  # BOM UTF-8 (Excel)
+        yield writer.writerow([CSV_FIELD_MAP[f]["label"] for f in fields])
+
+        rows = query.enable_eagerloads(False).yield_per(_CSV_BATCH).execution_options(stream_results=True)
+        for row in rows:
+            yield writer.writerow(build_row(*row))
 
     csv_name = "magatomatique_export.csv"
-    resp = Response(output.getvalue(), mimetype="text/csv")
+    resp = Response(stream_with_context(generate()), mimetype="text/csv")
     resp.headers["Content-Disposition"] = f"attachment; filename={csv_name}"
     return resp
 
@@ -769,7 +1152,7 @@ def magatomatique_export():
     if not _can_view():
         abort(403)
 
-    flt = normalize_filters(dict(request.args), user=current_user)
+    flt = _request_filters()
 
     export_mode = (request.args.get("export_mode") or "flat").strip().lower()
     participant_q = (request.args.get("participant_q") or "").strip() or None
@@ -790,19 +1173,11 @@ def magatomatique_export():
     # Mode "per_atelier" : export annuel 1 feuille = 1 atelier
     if export_mode in ("per_atelier", "per-atelier", "atelier"):
         wb = _build_magato_per_atelier_workbook(flt)
-        bio = BytesIO()
-        wb.save(bio)
-        bio.seek(0)
-
-        filename = "magatomatique_par_atelier.xlsx"
-        return send_file(
-            bio,
-            as_attachment=True,
-            download_name=filename,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        return _send_xlsx(wb, "magatomatique_par_atelier.xlsx")
 
-    magato = compute_magatomatique(
+    # mêmes filtres que le dashboard (année en cours par défaut) : même résultat, même clé de cache
+    _default_current_year(flt)
+    magato = _cached_magatomatique(
         flt,
         participant_q=participant_q,
         view=view,
@@ -813,9 +1188,9 @@ def magatomatique_export():
     if magato.get("restricted"):
         abort(403)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Synthese"
+    # écriture seule (xlsxwriter si STATS_XLSX_ENGINE=xlsxwriter) : lignes streamées au fil des append()
+    wb = _new_export_workbook()
+    ws = wb.create_sheet("Synthese")
 
     # En-têtes synthèse macro (secteurs)
     ws.append(["Synthèse par secteur"])
@@ -829,75 +1204,109 @@ def magatomatique_export():
     for r in (magato.get("macro") or {}).get("by_atelier", []):
         ws.append([r["secteur"], r["atelier_nom"], r["nb_sessions"], r["nb_presences"], r["nb_participants_uniques"]])
 
+    # Dates formatées une fois par valeur distincte (beaucoup de participants/sessions partagent les mêmes jours)
+    date_strs: dict = {}
+
+    def fmt_day(value) -> str:
+        text = date_strs.get(value)
+        if text is None:
+            text = date_strs[value] = _fmt_date(value)
+        return text
+
     # Feuille participants (si dispo)
     if magato.get("participants"):
         ws2 = wb.create_sheet("Participants")
         ws2.append(["Participants (dans le périmètre filtré)"])
         ws2.append(["Nom", "Prénom", "Ville", "Quartier", "Nb présences", "1ère venue", "Dernière venue"])
+        append = ws2.append
         for p in magato["participants"]:
-            fd = p.get("first_date")
-            ld = p.get("last_date")
-            ws2.append([
-                p.get("nom",""),
-                p.get("prenom",""),
-                p.get("ville") or "",
-                p.get("quartier") or "",
-                int(p.get("nb_presences",0)),
-                fd.strftime("%Y-%m-%d") if fd else "",
-                ld.strftime("%Y-%m-%d") if ld else "",
+            get = p.get
+            append([
+                get("nom", ""),
+                get("prenom", ""),
+                get("ville") or "",
+                get("quartier") or "",
+                int(get("nb_presences", 0)),
+                fmt_day(get("first_date")),
+                fmt_day(get("last_date")),
             ])
 
     # Feuille matrice (si view=matrix)
     if magato.get("view") == "matrix" and magato.get("sessions") and magato.get("participants"):
-        ws3 = wb.create_sheet("Matrice")
         sessions = magato["sessions"]
         participants = magato["participants"]
         matrix = magato.get("matrix") or {}
 
-        header = ["Nom", "Prénom"] + [f'{s["atelier"]} · {s["label"]}' for s in sessions]
-        ws3.append(header)
-
-        for p in participants:
-            row = [p.get("nom",""), p.get("prenom","")]
-            pid = int(p["id"])
-            for s in sessions:
-                sid = int(s["id"])
-                row.append("1" if matrix.get((pid, sid)) else "")
-            ws3.append(row)
-
-        # Ajuste largeur colonnes
-        for col_idx in range(1, len(header) + 1):
-            ws3.column_dimensions[get_column_letter(col_idx)].width = 16 if col_idx <= 2 else 12
+        # Calculés une fois pour toutes les lignes (pas de int()/get() par cellule)
+        sids = [int(s["id"]) for s in sessions]
+
+        # Garde-fou (STATS_MATRIX_MAX_CELLS) : matrice trop grande -> feuille Matrice réduite à une explication
+        max_cells = current_app.config.get("STATS_MATRIX_MAX_CELLS", 0)
+        if max_cells and len(sids) * len(participants) > max_cells:
+            ws3 = wb.create_sheet("Matrice")
+            ws3.append((
+                f"Matrice non générée : {len(participants)} participants x {len(sids)} sessions "
+                f"dépasse la limite de {max_cells} cellules. Réduire le périmètre (filtres, max_*) "
+                "ou utiliser la feuille Participations.",
+            ))
+        else:
+            header = ["Nom", "Prénom"] + [f'{s["atelier"]} · {s["label"]}' for s in sessions]
+            widths = {col_idx: 16 if col_idx <= 2 else 12 for col_idx in range(1, len(header) + 1)}
+
+            bit_values = [1 << k for k in range(len(sids))]
+
+            # Présences en masque de bits par participant : bit k = présent à sids[k]
+            bit_by_sid = dict(zip(sids, bit_values))
+            mask_by_pid: dict[int, int] = {}
+            for (pid, sid), present in matrix.items():
+                bit = bit_by_sid.get(sid)
+                if present and bit:
+                    mask_by_pid[pid] = mask_by_pid.get(pid, 0) | bit
+            mask_get = mask_by_pid.get
+            n_sessions = len(sids)
+
+            if isinstance(wb, RawWorkbook):
+                # XML direct : une ligne = un gabarit par colonne présente, cellules vides omises
+                people = ((p.get("nom", ""), p.get("prenom", ""), mask_get(int(p["id"]), 0)) for p in participants)
+                wb.add_sheet_xml("Matrice", matrix_sheet_xml(header, people, widths))
+            else:
+                ws3 = wb.create_sheet("Matrice")
+                # Largeurs avant le premier append (obligatoire en write_only)
+                _set_column_widths(ws3, widths)
+                ws3.append(header)
+                for p in participants:
+                    bits = mask_get(int(p["id"]), 0)
+                    row = [p.get("nom", ""), p.get("prenom", "")]
+                    if not bits:
+                        # aucune présence dans les sessions affichées : cellules de sessions laissées vides
+                        ws3.append(row)
+                        continue
+                    # masque -> chaîne binaire (bit 0 en tête) -> "1"/"" : conversion faite par map() en C
+                    row += map(_MATRIX_CELL.__getitem__, f"{bits:0{n_sessions}b}"[::-1])
+                    ws3.append(row)
 
         ws4 = wb.create_sheet("Participations")
-        ws4.append(["Nom", "Prénom", "Atelier", "Secteur", "Date session", "ID session"])
-        for p in participants:
-            pid = int(p["id"])
-            for s in sessions:
-                sid = int(s["id"])
-                if matrix.get((pid, sid)):
-                    ws4.append(
-                        [
-                            p.get("nom", ""),
-                            p.get("prenom", ""),
-                            s.get("atelier", ""),
-                            s.get("secteur", ""),
-                            s.get("date").strftime("%Y-%m-%d") if s.get("date") else "",
-                            sid,
-                        ]
-                    )
-
-        for col_idx in range(1, 7):
-            ws4.column_dimensions[get_column_letter(col_idx)].width = 18
-
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-
-    filename = "magatomatique.xlsx"
-    return send_file(
-        bio,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+        _set_column_widths(ws4, dict.fromkeys(range(1, 7), 18))
+        ws4.append(("Nom", "Prénom", "Atelier", "Secteur", "Date session", "ID session"))
+        # Fin de ligne constante par session : (atelier, secteur, date, id)
+        sess_tuples = [
+            (s.get("atelier", ""), s.get("secteur", ""), fmt_day(s.get("date")), sid)
+            for sid, s in zip(sids, sessions)
+        ]
+        # Une passe sur les présences (K entrées) au lieu de P x S tests ;
+        # tri sur les positions = même ordre que la matrice (participants puis sessions)
+        p_pos = {int(p["id"]): i for i, p in enumerate(participants)}
+        s_pos = {sid: k for k, sid in enumerate(sids)}
+        hits = sorted(
+            (p_pos[pid], s_pos[sid])
+            for (pid, sid), present in matrix.items()
+            if present and pid in p_pos and sid in s_pos
+        )
+        # nom/prénom lus une fois par participant, pas à chaque présence ;
+        # une ligne = concaténation de deux tuples déjà construits
+        names = [(p.get("nom", ""), p.get("prenom", "")) for p in participants]
+        append = ws4.append
+        for i, k in hits:
+            append(names[i] + sess_tuples[k])
+
+    return _send_xlsx(wb, "magatomatique.xlsx")
@@ -0,0 +1,235 @@
+"""Écriture xlsx "brute" : le XML des feuilles est produit en chaînes et zippé directement.
+
+Pas de dépendance Flask / base de données : les fonctions de rendu (render_atelier_sheet)
+peuvent tourner dans un ProcessPoolExecutor et renvoyer le XML d'une feuille en bytes.
+Seul le strict nécessaire est géré : texte (inlineStr), nombres, largeurs de colonnes.
+"""
+
+from __future__ import annotations
+
+import zipfile
+from functools import lru_cache
+from xml.sax.saxutils import escape, quoteattr
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_SHEET_HEAD = f'{_XML_DECL}<worksheet xmlns="{_NS_MAIN}">'
+
+_STYLES_XML = (
+    f'{_XML_DECL}<styleSheet xmlns="{_NS_MAIN}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+# Deflate niveau 1 plutôt que 6 (défaut zlib) : compression ~2x plus rapide sur une grosse
+# matrice, pour un fichier ~30 % plus gros (le XML des feuilles se compresse bien dès le niveau 1)
+DEFAULT_COMPRESSLEVEL = 1
+
+# Caractères de contrôle interdits en XML 1.0 (openpyxl lèverait IllegalCharacterError)
+_ILLEGAL_XML = dict.fromkeys([*range(0, 9), 11, 12, *range(14, 32)])
+
+
+@lru_cache(maxsize=None)
+def column_letter(idx: int) -> str:
+    """1 -> "A", 27 -> "AA" (équivalent de openpyxl.utils.get_column_letter)."""
+    letters = ""
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+@lru_cache(maxsize=8192, typed=True)
+def xml_text(value) -> str:
+    """Texte échappé pour un élément <t>.
+
+    Mémorisé : un même nom / atelier / secteur revient sur beaucoup de lignes (Participations,
+    matrices), il n'est échappé qu'une fois par valeur distincte.
+    """
+    return escape(str(value).translate(_ILLEGAL_XML))
+
+
+def _cell(ref: str, value) -> str:
+    if value is None or value == "":
+        return ""  # cellule absente = vide
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{xml_text(value)}</t></is></c>'
+
+
+def row_xml(r: int, values) -> str:
+    cells = "".join(_cell(f"{column_letter(c)}{r}", v) for c, v in enumerate(values, 1))
+    return f'<row r="{r}">{cells}</row>'
+
+
+def width_runs(widths: dict[int, float]) -> list[tuple[int, int, float]]:
+    """{colonne: largeur} -> [(1ère colonne, dernière colonne, largeur)], colonnes contiguës de même largeur fusionnées."""
+    runs: list[tuple[int, int, float]] = []
+    for col, width in sorted(widths.items()):
+        if runs and runs[-1][1] == col - 1 and runs[-1][2] == width:
+            runs[-1] = (runs[-1][0], col, width)
+        else:
+            runs.append((col, col, width))
+    return runs
+
+
+def _cols_xml(runs) -> str:
+    if not runs:
+        return ""
+    cols = "".join(f'<col min="{first}" max="{last}" width="{w}" customWidth="1"/>' for first, last, w in runs)
+    return f"<cols>{cols}</cols>"
+
+
+def sheet_xml(rows, widths: dict[int, float] | None = None) -> bytes:
+    """XML complet d'une feuille à partir de lignes (itérables de valeurs)."""
+    parts = [_SHEET_HEAD, _cols_xml(width_runs(widths or {})), "<sheetData>"]
+    parts.extend(row_xml(r, values) for r, values in enumerate(rows, 1))
+    parts.append("</sheetData></worksheet>")
+    return "".join(parts).encode("utf-8")
+
+
+def atelier_sheet_rows(title_line: str, header_labels, session_ids, people):
+    """Lignes d'une feuille "1 atelier" : titre, en-têtes, puis (nom, prénom, "1"/"" par session)."""
+    yield (title_line,)
+    yield ("Nom", "Prénom", *header_labels)
+    for nom, prenom, sids in people:
+        yield (nom or "", prenom or "", *["1" if sid in sids else "" for sid in session_ids])
+
+
+def render_atelier_sheet(title_line: str, header_labels, session_ids, people, widths=None) -> bytes:
+    """XML de la feuille d'un atelier (appelable dans un processus fils)."""
+    return sheet_xml(atelier_sheet_rows(title_line, header_labels, session_ids, people), widths)
+
+
+# Fin d'une cellule "1" de matrice, après "<c r=\"<colonne><ligne>"
+_ONE_CELL_TAIL = '" t="inlineStr"><is><t>1</t></is></c>'
+
+
+def matrix_sheet_xml(header, people, widths: dict[int, float] | None = None) -> bytes:
+    """XML d'une feuille matrice : en-tête puis, par personne, nom, prénom et "1" par présence.
+
+    people : itérable de (nom, prénom, masque) où le bit k du masque = présent à la colonne k + 3.
+    Seules les cellules "1" sont écrites (cellule absente = vide) ; le reste de la cellule est un
+    gabarit constant par colonne, donc une ligne = un "".join() sans passer par _cell().
+    """
+    col_heads = [f'<c r="{column_letter(k + 3)}' for k in range(len(header) - 2)]
+    parts = [_SHEET_HEAD, _cols_xml(width_runs(widths or {})), "<sheetData>", row_xml(1, header)]
+    for r, (nom, prenom, bits) in enumerate(people, 2):
+        rs = str(r)
+        parts.append(f'<row r="{rs}">{_cell("A" + rs, nom)}{_cell("B" + rs, prenom)}')
+        if bits:
+            heads = []
+            while bits:
+                low = bits & -bits
+                heads.append(col_heads[low.bit_length() - 1])
+                bits ^= low
+            tail = rs + _ONE_CELL_TAIL
+            parts.append(tail.join(heads))
+            parts.append(tail)
+        parts.append("</row>")
+    parts.append("</sheetData></worksheet>")
+    return "".join(parts).encode("utf-8")
+
+
+def unique_sheet_title(title: str, titles: set[str]) -> str:
+    """Titre de feuille non encore pris (titles = titres déjà utilisés, en minuscules, mis à jour).
+
+    Excel refuse les doublons (sans tenir compte de la casse) : même suffixe numérique qu'openpyxl.
+    """
+    base, n = title, 0
+    while title.lower() in titles:
+        n += 1
+        title = f"{base[:31 - len(str(n))]}{n}"
+    titles.add(title.lower())
+    return title
+
+
+class RawSheet:
+    """Feuille en écriture seule : chaque append() est converti en XML immédiatement."""
+
+    def __init__(self):
+        self._rows: list[str] = []
+        self._cols: list[tuple[int, int, float]] = []
+
+    def append(self, values) -> None:
+        self._rows.append(row_xml(len(self._rows) + 1, values))
+
+    def set_width(self, first_col: int, last_col: int, width: float) -> None:
+        self._cols.append((first_col, last_col, width))
+
+    def to_xml(self) -> bytes:
+        return "".join((_SHEET_HEAD, _cols_xml(self._cols), "<sheetData>", *self._rows, "</sheetData></worksheet>")).encode("utf-8")
+
+
+class RawWorkbook:
+    """Workbook minimal (create_sheet / append / save) qui écrit le zip xlsx lui-même."""
+
+    def __init__(self, compresslevel: int = DEFAULT_COMPRESSLEVEL):
+        self._sheets: list[tuple[str, RawSheet | bytes]] = []
+        self._titles: set[str] = set()
+        self._compresslevel = compresslevel
+
+    def _unique_title(self, title: str) -> str:
+        return unique_sheet_title(title, self._titles)
+
+    def create_sheet(self, title: str) -> RawSheet:
+        ws = RawSheet()
+        self._sheets.append((self._unique_title(title), ws))
+        return ws
+
+    def add_sheet_xml(self, title: str, xml: bytes) -> None:
+        """Ajoute une feuille dont le XML est déjà rendu (ex. par render_atelier_sheet)."""
+        self._sheets.append((self._unique_title(title), xml))
+
+    def save(self, fh) -> None:
+        n = len(self._sheets)
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, n + 1)
+        )
+        content_types = (
+            f'{_XML_DECL}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f"{overrides}</Types>"
+        )
+        root_rels = (
+            f'{_XML_DECL}<Relationships xmlns="{_NS_PKG_REL}">'
+            f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        )
+        sheets = "".join(
+            f'<sheet name={quoteattr(title)} sheetId="{i}" r:id="rId{i}"/>'
+            for i, (title, _) in enumerate(self._sheets, 1)
+        )
+        workbook = f'{_XML_DECL}<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><sheets>{sheets}</sheets></workbook>'
+        wb_rels = "".join(
+            f'<Relationship Id="rId{i}" Type="{_NS_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, n + 1)
+        )
+        wb_rels = (
+            f'{_XML_DECL}<Relationships xmlns="{_NS_PKG_REL}">{wb_rels}'
+            f'<Relationship Id="rId{n + 1}" Type="{_NS_REL}/styles" Target="styles.xml"/></Relationships>'
+        )
+
+        with zipfile.ZipFile(fh, "w", zipfile.ZIP_DEFLATED, compresslevel=self._compresslevel) as zf:
+            zf.writestr("[Content_Types].xml", content_types)
+            zf.writestr("_rels/.rels", root_rels)
+            zf.writestr("xl/workbook.xml", workbook)
+            zf.writestr("xl/_rels/workbook.xml.rels", wb_rels)
+            zf.writestr("xl/styles.xml", _STYLES_XML)
+            for i, (_, sheet) in enumerate(self._sheets, 1):
+                zf.writestr(f"xl/worksheets/sheet{i}.xml", sheet if isinstance(sheet, bytes) else sheet.to_xml())
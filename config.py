@@ -50,6 +50,23 @@ class Config:
         "Animation Globale",
     ]
 
+    # Moteur des exports xlsx statsimpact : "openpyxl" (défaut), "xlsxwriter"
+    # (constant_memory, pour les très gros exports ; nécessite pip install xlsxwriter)
+    # ou "xml" (XML des feuilles écrit directement, sans bibliothèque)
+    STATS_XLSX_ENGINE = os.environ.get("STATS_XLSX_ENGINE", "openpyxl").strip().lower()
+    # Moteur "xml" : nb de processus pour rendre les feuilles de l'export "par atelier" (0/1 = en série).
+    # Processus "spawn" : le script de lancement est ré-importé dans chaque fils, il ne doit créer
+    # l'app que sous if __name__ == "__main__" (cas de run_waitress.py)
+    STATS_XLSX_PROCESSES = int(os.environ.get("STATS_XLSX_PROCESSES", "0"))
+
+    # Export magatomatique "matrice" : au-delà de ce nb de cellules (participants x sessions),
+    # la feuille Matrice ne contient qu'une ligne d'explication ; Participations reste complète (0 = sans limite)
+    STATS_MATRIX_MAX_CELLS = int(os.environ.get("STATS_MATRIX_MAX_CELLS", "500000"))
+    # Durée (s) de réutilisation du calcul "magatomatique" entre dashboard et export xlsx (0 = pas de cache).
+    # Désactivé par défaut : les émargements saisis ailleurs (activité, kiosque) ne vident pas ce cache,
+    # un export peut donc montrer des chiffres vieux de TTL secondes au plus
+    STATS_MAGATO_CACHE_TTL = int(os.environ.get("STATS_MAGATO_CACHE_TTL", "0"))
+
     # SMTP optionnel (envoi des feuilles d'émargement)
     MAIL_HOST = os.environ.get("MAIL_HOST", "")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", "587"))
@@ -1,6 +1,5 @@
 import os
 from waitress import serve
-from wsgi import app
 
 def _safe_print(msg: str) -> None:
     """
@@ -36,4 +35,8 @@ if __name__ == "__main__":
                 pass
         _safe_print(f"DATABASE_URL={safe}")
 
+    # Import ici et pas en tête de module : les processus "spawn" (STATS_XLSX_PROCESSES)
+    # ré-importent ce script et ne doivent pas recréer l'app (create_app + init du schéma)
+    from wsgi import app
+
     serve(app, host=host, port=port, threads=threads)